@@ -1,6 +1,28 @@
 import math
 import csv
-from collections import defaultdict
+import hashlib
+import json
+import os
+import argparse
+from collections import defaultdict, OrderedDict, Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from optimal_tree import OptimalTreeSearch, SearchBudgetExceeded, DEFAULT_TIME_BUDGET, DEFAULT_MAX_STATES
+
+try:
+    import numpy as np
+    from columnar_data import ColumnarData, load_columnar
+except ImportError:  # only needed for use_numpy=True and columnar=True
+    np = ColumnarData = load_columnar = None
+
+try:
+    _popcount = int.bit_count  # Python 3.10+
+except AttributeError:
+    def _popcount(mask):
+        return bin(mask).count("1")
+
+TREE_CACHE_VERSION = 1  # bump when the tree file layout or the builder's choices change
+DEFAULT_LAZY_CACHE_NODES = 65536  # expanded nodes a lazy tree keeps below its root
+PER_OBJECT_COUNT_RATIO = 1024  # count objects one by one below 1/this of the dataset (measured break-even)
 
 class TreeNode:
     def __init__(self, question=None, object_name=None):
@@ -9,9 +31,133 @@ class TreeNode:
         self.left = None          
         self.right = None        
 
+class LazyTreeNode(TreeNode):
+    """A TreeNode whose children are only built when they are first visited.
+
+    Expanded children live in the guesser's bounded node cache, so one that has
+    been evicted is just built again on its next visit.
+    """
+
+    def __init__(self, guesser, path, candidates, features, question=None, object_name=None):
+        self.question = question
+        self.object_name = object_name
+        self.path = path
+        self.candidates = candidates  # bitmask of the objects that reach this node
+        self.features = features  # features still available at this node
+        self._guesser = guesser
+
+    @property
+    def left(self):
+        return self._guesser._lazy_child(self, 0)
+
+    @property
+    def right(self):
+        return self._guesser._lazy_child(self, 1)
+
+class SplitCounts:
+    """Yes counts per feature over a game's remaining candidates.
+
+    Answers only ever remove candidates, so instead of recounting every feature
+    over everything that's left, narrow() counts the smaller of the kept and
+    removed sides and derives the rest. Over a whole game that touches each
+    object about once, and the best split is then an O(F) scan of the counts.
+    """
+
+    def __init__(self, guesser, candidates, counts):
+        self.guesser = guesser
+        self.candidates = candidates
+        self.total = _popcount(candidates)
+        self.counts = counts
+
+    def narrow(self, kept):
+        """Drops every candidate not in the kept bitmask"""
+        kept_total = _popcount(kept)
+        removed_total = self.total - kept_total
+        if kept_total <= removed_total:
+            self.counts = self.guesser._yes_counts(kept, kept_total)
+        elif removed_total:
+            removed = self.guesser._yes_counts(self.candidates & ~kept, removed_total)
+            self.counts = {feature: count - removed[feature] for feature, count in self.counts.items()}
+        self.candidates, self.total = kept, kept_total
+
+    def best_split(self, features):
+        """Largest min(yes, no) over the given features"""
+        counts, total = self.counts, self.total
+        return max((min(counts[f], total - counts[f]) for f in features), default=0)
+
+# guessed: whether the object was found; guess: the name that was confirmed
+GameResult = namedtuple("GameResult", ["guessed", "questions", "guess"])
+
+class ConsoleOracle:
+    """Asks the player at the terminal"""
+
+    def ask(self, feature):
+        return input(f"{feature}? (yes/no) ").lower() == 'yes'
+
+    def guess(self, object_name):
+        return input(f"Is it a {object_name}? (yes/no) ").lower() == 'yes'
+
+class SecretOracle:
+    """Answers truthfully for a secret object, from the guesser's dataset"""
+
+    def __init__(self, data, secret):
+        self.secret = secret
+        self.answers = data[secret]
+
+    def ask(self, feature):
+        return self.answers[feature] == 1
+
+    def guess(self, object_name):
+        return object_name == self.secret
+
 class ObjectGuesser:
-    def __init__(self, csv_path):
-        self.data, self.features = self._load_data(csv_path)
+    def __init__(self, csv_path, use_numpy=False, tree_cache_dir=None, lazy=False,
+                 lazy_cache_size=DEFAULT_LAZY_CACHE_NODES, columnar=False, sidecar=True, solver="greedy",
+                 objective="expected", time_budget=DEFAULT_TIME_BUDGET, max_states=DEFAULT_MAX_STATES):
+        """use_numpy builds trees from a uint8 object x feature matrix, scoring
+        every feature of a node in one batched column sum.
+
+        tree_cache_dir keeps built trees on disk, keyed by a hash of the CSV's
+        contents, so later processes load them instead of rebuilding.
+
+        lazy skips the up-front build: each node is chosen when a game first reaches
+        it, without recursion, and at most lazy_cache_size expanded nodes are kept.
+        Lazy trees are never written to tree_cache_dir, which would need the whole tree.
+
+        columnar streams the CSV into a packed bit matrix (see columnar_data.py)
+        instead of a dict per row, and memory-maps it from a sidecar file next time.
+        sidecar=False skips the sidecar, a directory name keeps it there instead of
+        next to the CSV.
+
+        solver="optimal" searches for the tree with the fewest expected (or, with
+        objective="worst", worst-case) questions, see optimal_tree.py. If that takes
+        more than time_budget seconds or max_states memoized subsets, the greedy
+        information-gain tree is used instead.
+        """
+        if solver not in ("greedy", "optimal"):
+            raise ValueError(f"unknown solver {solver!r}, expected 'greedy' or 'optimal'")
+        if (use_numpy or columnar) and np is None:
+            raise ImportError("use_numpy=True and columnar=True require numpy")
+        self.csv_path = csv_path
+        if columnar:
+            self.data, self.features = load_columnar(csv_path, sidecar=sidecar)
+        else:
+            self.data, self.features = self._load_data(csv_path)
+        self.use_numpy = use_numpy
+        self.tree_cache_dir = tree_cache_dir
+        self.lazy = lazy
+        self.lazy_cache_size = lazy_cache_size
+        self.solver = solver
+        self.objective = objective
+        self.time_budget = time_budget
+        self.max_states = max_states
+        self.fell_back = False  # whether the last optimal build ran out of budget
+        self._lazy_nodes = OrderedDict()
+        self._loaded = (self.data, self.features)
+        self._compiled_for = None
+        self._matrix_for = None
+        self._tree = None
+        self._tree_for = None
     
     def _load_data(self, csv_path):
         """Loads data from CSV and returns (data_dict, features_list)"""
@@ -22,7 +168,91 @@ class ObjectGuesser:
             data = {row[0]: {f: int(row[i+1]) for i, f in enumerate(features)} 
                    for row in reader}
         return data, features
-    
+
+    def _bitsets(self):
+        """Returns (object_names, feature_masks), compiling them from self.data if it changed.
+
+        Bit i of a mask stands for object_names[i]. Names are sorted, so walking a
+        mask's bits from low to high yields its objects in alphabetical order.
+        """
+        compiled = self._compiled_for
+        if compiled is None or compiled[0] is not self.data or compiled[1] is not self.features:
+            if self._is_columnar():
+                # already packed in this layout, each mask is one bytes-to-int conversion
+                names = self.data.names
+                masks = {feature: self.data.feature_mask(feature) for feature in self.features}
+                index = self.data.index
+            else:
+                names = sorted(self.data)
+                masks = {}
+                for feature in self.features:
+                    mask = 0
+                    for i, name in enumerate(names):
+                        if self.data[name][feature] == 1:
+                            mask |= 1 << i
+                    masks[feature] = mask
+                index = {name: i for i, name in enumerate(names)}
+            self._object_names, self._feature_masks = names, masks
+            self._index = index
+            self._all_mask = (1 << len(names)) - 1
+            self._feature_totals = {feature: _popcount(mask) for feature, mask in masks.items()}
+            self._compiled_for = (self.data, self.features)
+        return self._object_names, self._feature_masks
+
+    def _matrix(self):
+        """Returns (object_names, matrix) with matrix[i, j] = self.data[object_names[i]][self.features[j]]"""
+        compiled = self._matrix_for
+        if compiled is None or compiled[0] is not self.data or compiled[1] is not self.features:
+            if self._is_columnar():
+                names, matrix = self.data.names, self.data.matrix(self.features)
+            else:
+                names = sorted(self.data)
+                matrix = np.zeros((len(names), len(self.features)), dtype=np.uint8)
+                for i, name in enumerate(names):
+                    row = self.data[name]
+                    matrix[i] = [row[feature] for feature in self.features]
+            self._matrix_names, self._matrix_array = names, matrix
+            self._matrix_for = (self.data, self.features)
+        return self._matrix_names, self._matrix_array
+
+    def _yes_counts(self, candidates, size):
+        """Returns {feature: number of the size candidates answering yes}"""
+        names, masks = self._bitsets()
+        if size * PER_OBJECT_COUNT_RATIO < len(names) and not self._is_columnar():
+            # a popcount scans every object's bit, so a few objects are quicker to add up one by one
+            # (but not from packed columns, where building each row costs more than it saves)
+            counts = dict.fromkeys(self.features, 0)
+            for name in self._names_of(candidates):
+                row = self.data[name]
+                for feature in self.features:
+                    counts[feature] += row[feature]
+            return counts
+        return {feature: _popcount(candidates & mask) for feature, mask in masks.items()}
+
+    def _is_columnar(self):
+        return ColumnarData is not None and isinstance(self.data, ColumnarData)
+
+    def _mask_of(self, objects):
+        """Returns the candidate bitmask for a list of object names"""
+        self._bitsets()
+        mask = 0
+        for obj in objects:
+            mask |= 1 << self._index[obj]
+        return mask
+
+    def _names_of(self, mask):
+        """Returns the object names in a candidate bitmask, alphabetically"""
+        names, _ = self._bitsets()
+        # find() over the binary digits skips runs of zeros in C, where peeling off
+        # the lowest bit with int arithmetic copies the whole mask every time
+        digits = bin(mask)[:1:-1]  # bit 0 first
+        result = []
+        i = digits.find('1')
+        while i >= 0:
+            result.append(names[i])
+            i = digits.find('1', i + 1)
+        return result
+
     def _entropy(self, yes_count, no_count):
         """Calculates entropy for a yes/no split"""
         total = yes_count + no_count
@@ -34,58 +264,292 @@ class ObjectGuesser:
     
     def _information_gain(self, objects, feature):
         """Calculates how much a feature splits the data"""
-        yes = [obj for obj in objects if self.data[obj][feature] == 1]
-        no = [obj for obj in objects if self.data[obj][feature] == 0]
-        
+        _, masks = self._bitsets()
+        candidates = self._mask_of(objects)
+        return self._split_gain(_popcount(candidates & masks[feature]), _popcount(candidates))
+
+    def _split_gain(self, yes_count, total):
+        """Information gain of splitting total objects into yes_count and the rest"""
+        no_count = total - yes_count
+
         # Original entropy
-        total_entropy = self._entropy(len(yes), len(no))
-        
+        total_entropy = self._entropy(yes_count, no_count)
+
         # Weighted entropy after split
-        weight_yes = len(yes) / len(objects)
-        weight_no = len(no) / len(objects)
+        weight_yes = yes_count / total
+        weight_no = no_count / total
         gain = total_entropy - (
-            weight_yes * self._entropy(len(yes), 0) + 
-            weight_no * self._entropy(0, len(no))
+            weight_yes * self._entropy(yes_count, 0) +
+            weight_no * self._entropy(0, no_count)
         )
         return gain
     
+    def _information_gains(self, yes_counts, total):
+        """Vectorized _split_gain for an array of yes counts out of total objects"""
+        p_yes = yes_counts / total
+        p_no = (total - yes_counts) / total
+        with np.errstate(divide="ignore", invalid="ignore"):
+            entropy = -p_yes * np.log2(p_yes) - p_no * np.log2(p_no)
+        # pure splits have no entropy, and the weighted child entropies are always 0
+        return np.where((yes_counts == 0) | (yes_counts == total), 0.0, entropy)
+
     def _build_tree(self, objects, features):
-        """Recursively builds the decision tree"""
-        if not objects:
-            return None
+        """Builds the decision tree"""
+        if self.use_numpy:
+            names, _ = self._matrix()
+            position = {name: i for i, name in enumerate(names)}
+            column = {feature: j for j, feature in enumerate(self.features)}
+            rows = np.array(sorted(position[obj] for obj in objects), dtype=np.intp)
+            columns = np.array([column[f] for f in features], dtype=np.intp)
+            return self._build_subtree_numpy(rows, columns)
+        return self._build_subtree(self._mask_of(objects), features)
+
+    def _build_subtree_numpy(self, rows, columns):
+        """Builds the decision tree for the objects and features at the given matrix indices.
+
+        rows stays in ascending (alphabetical) order, and np.argmax returns the first of
+        equal gains, so ties go to the earliest feature just as max() does.
+        """
+        names, matrix = self._matrix()
+        root = TreeNode()
+        pending = [(rows, columns, root, 'left')]
+        while pending:
+            rows, columns, parent, side = pending.pop()
+            if len(rows) == 0:
+                continue
+
+            if len(rows) == 1:
+                node = TreeNode(object_name=names[rows[0]])
+            elif len(columns) == 0:
+                node = TreeNode(object_name=",".join(names[i] for i in rows))
+            else:
+                # yes counts for every remaining feature in one column sum
+                yes_counts = matrix[np.ix_(rows, columns)].sum(axis=0, dtype=np.int64)
+                best = int(np.argmax(self._information_gains(yes_counts, len(rows))))
+                best_column = columns[best]
+
+                answers = matrix[rows, best_column]
+                remaining_columns = np.delete(columns, best)
+
+                node = TreeNode(question=self.features[best_column])
+                pending.append((rows[answers == 0], remaining_columns, node, 'right'))
+                pending.append((rows[answers == 1], remaining_columns, node, 'left'))
+            setattr(parent, side, node)
+
+        return root.left
+
+    def _build_subtree(self, candidates, features):
+        """Builds the decision tree for a candidate bitmask.
+
+        Works from a stack instead of recursing: when each question only rules out
+        one object, as with one-hot data, the tree is as deep as there are objects.
+        """
+        _, masks = self._bitsets()
+        root = TreeNode()
+        pending = [(candidates, features, root, 'left')]
+        while pending:
+            candidates, features, parent, side = pending.pop()
+            if not candidates:
+                continue
+
+            question, object_name = self._choose_split(candidates, features)
+            if question is None:
+                node = TreeNode(object_name=object_name)
+            else:
+                # Remove used feature, then split objects
+                remaining_features = [f for f in features if f != question]
+                node = TreeNode(question=question)
+                pending.append((candidates & ~masks[question], remaining_features, node, 'right'))
+                pending.append((candidates & masks[question], remaining_features, node, 'left'))
+            setattr(parent, side, node)
+
+        return root.left
+
+    def _choose_split(self, candidates, features):
+        """Returns (question, None) for the feature to ask about a non-empty candidate
+        bitmask, or (None, object_name) if the candidates make a leaf"""
+        total = _popcount(candidates)
 
-        objects = sorted(objects)  # Ensure consistent alphabetical order
-        
         # create a leaf node with an object if we have exactly one 
-        if len(objects) == 1:
-            return TreeNode(object_name=objects[0])
+        if total == 1:
+            return None, self._names_of(candidates)[0]
         
         # If no more features but multiple objects, create a node with all objects
-        if not features and len(objects) > 1:
+        if not features:
             # Store all objects in alphabetical order
-            return TreeNode(object_name=",".join(objects))
+            return None, ",".join(self._names_of(candidates))
         
         # Find feature with maximum information gain
-        best_feature = max(features, key=lambda f: self._information_gain(objects, f))
-        
-        # Split objects
-        yes_objects = [obj for obj in objects if self.data[obj][best_feature] == 1]
-        no_objects = [obj for obj in objects if self.data[obj][best_feature] == 0]
-        
-        # Remove used feature
-        remaining_features = [f for f in features if f != best_feature]
-        
-        node = TreeNode(question=best_feature)
-        node.left = self._build_tree(yes_objects, remaining_features)
-        node.right = self._build_tree(no_objects, remaining_features)
-        
-        return node
+        _, masks = self._bitsets()
+        best_feature = max(features, key=lambda f: self._split_gain(_popcount(candidates & masks[f]), total))
+        return best_feature, None
+
+    def _lazy_root(self):
+        """Returns an unexpanded LazyTreeNode for the whole dataset"""
+        self._lazy_nodes = OrderedDict()
+        self._bitsets()
+        return self._lazy_node(1, self._all_mask, list(self.features))
+
+    def _lazy_node(self, path, candidates, features):
+        if not candidates:
+            return None
+        question, object_name = self._choose_split(candidates, features)
+        return LazyTreeNode(self, path, candidates, features, question, object_name)
+
+    def _lazy_child(self, node, side):
+        """Returns node's yes (side 0) or no (side 1) child, building it on first visit"""
+        if node.question is None:
+            return None
+        # a node's path from the root identifies it, with a leading 1 bit so depths differ
+        path = node.path * 2 + side
+        cache = self._lazy_nodes
+        if path in cache:
+            cache.move_to_end(path)
+            return cache[path]
+
+        _, masks = self._bitsets()
+        mask = masks[node.question]
+        candidates = node.candidates & mask if side == 0 else node.candidates & ~mask
+        child = self._lazy_node(path, candidates, [f for f in node.features if f != node.question])
+
+        cache[path] = child
+        if len(cache) > self.lazy_cache_size:
+            cache.popitem(last=False)  # least recently visited, rebuilt if it's reached again
+        return child
     
+    def get_tree(self):
+        """Returns the decision tree for the whole dataset, building it at most once per dataset"""
+        built = self._tree_for
+        if built is not None and built[0] is self.data and built[1] is self.features:
+            return self._tree
+
+        if self.lazy:
+            self._tree, self._tree_for = self._lazy_root(), (self.data, self.features)
+            return self._tree
+
+        # the on-disk copy is keyed by the CSV, so it only applies to the data loaded from it
+        path = None
+        if self.tree_cache_dir and self._loaded[0] is self.data and self._loaded[1] is self.features:
+            path = self._tree_cache_path()
+
+        tree = self._load_tree(path) if path else None
+        if tree is None:
+            if self.solver == "optimal":
+                tree = self._build_optimal_tree()
+            else:
+                tree = self._build_tree(list(self.data.keys()), self.features)
+            if path and not self.fell_back:
+                self._save_tree(tree, path)
+        self._tree, self._tree_for = tree, (self.data, self.features)
+        return tree
+
+    def _build_optimal_tree(self):
+        """Builds the least expected (or worst-case) questions tree, or the greedy one
+        if the search runs out of budget"""
+        names, masks = self._bitsets()
+        search = OptimalTreeSearch([masks[f] for f in self.features], self.objective,
+                                   self.time_budget, self.max_states)
+        try:
+            search.search(self._all_mask)
+        except (SearchBudgetExceeded, RecursionError):  # a deeper tree than the stack allows is over budget too
+            self.fell_back = True
+            return self._build_tree(list(self.data.keys()), self.features)
+        self.fell_back = False
+
+        root = TreeNode()
+        pending = [(self._all_mask, root, 'left')]
+        while pending:
+            candidates, parent, side = pending.pop()
+            choice = search.best.get(candidates)
+            if choice is None or choice[1] is None:
+                # a single object, or objects that are cheapest to guess in turn
+                node = TreeNode(object_name=",".join(self._names_of(candidates)))
+            else:
+                question = self.features[choice[1]]
+                node = TreeNode(question=question)
+                pending.append((candidates & masks[question], node, 'left'))
+                pending.append((candidates & ~masks[question], node, 'right'))
+            setattr(parent, side, node)
+        return root.left
+
+    def _tree_cache_path(self):
+        digest = hashlib.sha1()
+        with open(self.csv_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        solver = self.solver if self.solver == "greedy" else f"{self.solver}-{self.objective}"
+        return os.path.join(self.tree_cache_dir, f"{digest.hexdigest()}.{solver}.tree.json")
+
+    def _encode_tree(self, tree):
+        """Flattens a tree into a preorder token list: a feature index for a question
+        node, the object name(s) for a leaf, and None for a missing child."""
+        column = {feature: j for j, feature in enumerate(self.features)}
+        tokens = []
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                tokens.append(None)
+            elif node.question is not None:
+                tokens.append(column[node.question])
+                stack.append(node.right)
+                stack.append(node.left)  # popped first, so the yes branch comes next
+            else:
+                tokens.append(node.object_name)
+        return tokens
+
+    def _decode_tree(self, tokens):
+        """Rebuilds a tree from _encode_tree's token list"""
+        root = TreeNode()
+        slots = [(root, 'left')]
+        for token in tokens:
+            parent, side = slots.pop()
+            if token is None:
+                node = None
+            elif isinstance(token, int):
+                node = TreeNode(question=self.features[token])
+                slots.append((node, 'right'))
+                slots.append((node, 'left'))
+            else:
+                node = TreeNode(object_name=token)
+            setattr(parent, side, node)
+        return root.left
+
+    def _load_tree(self, path):
+        """Returns the tree saved at path, or None if it is missing or doesn't fit this dataset"""
+        try:
+            with open(path, 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if saved.get("version") != TREE_CACHE_VERSION or saved.get("features") != self.features:
+            return None
+        return self._decode_tree(saved["tree"])
+
+    def _save_tree(self, tree, path):
+        os.makedirs(self.tree_cache_dir, exist_ok=True)
+        saved = {"version": TREE_CACHE_VERSION, "features": self.features, "tree": self._encode_tree(tree)}
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(saved, f, separators=(',', ':'))
+        os.replace(temp_path, path)  # readers never see a half-written tree
+
     #determines if its better to guess an object or ask a question
-    def _should_guess(self, remaining_objects, remaining_features, questions_left):
-        """Determines if we should start guessing or continue asking questions"""
+    def _should_guess(self, remaining_objects, remaining_features, questions_left, split_counts=None):
+        """Determines if we should start guessing or continue asking questions
+
+        remaining_objects is a list of object names or a candidate bitmask.
+        split_counts (SplitCounts for the same candidates) saves recounting each feature.
+        """
+        if split_counts is not None:
+            candidates, total = remaining_objects, split_counts.total
+        elif isinstance(remaining_objects, int):
+            candidates, total = remaining_objects, _popcount(remaining_objects)
+        else:
+            candidates, total = None, len(remaining_objects)
+
         # If only one object, always guess
-        if len(remaining_objects) == 1:
+        if total == 1:
             return True
             
         # If no features left to distinguish objects, start guessing
@@ -94,96 +558,193 @@ class ObjectGuesser:
             
         # If not enough questions left to distinguish all objects, start guessing
         # (We need at least log2(n) questions to distinguish n objects)
-        if questions_left < math.log2(len(remaining_objects)):
+        if questions_left < math.log2(total):
             return True
             
         # Calculate best possible reduction in objects from asking another question
-        best_split = 0
-        for feature in remaining_features:
-            yes_count = sum(1 for obj in remaining_objects if self.data[obj][feature] == 1)
-            no_count = len(remaining_objects) - yes_count
-            best_split = max(best_split, min(yes_count, no_count))
+        if split_counts is not None:
+            best_split = split_counts.best_split(remaining_features)
+        else:
+            best_split = self._best_split(candidates, remaining_objects, remaining_features, total)
         
         # If best question eliminates less than half the objects and we have few enough 
         # objects that direct guessing would be faster, guess now
-        if best_split > len(remaining_objects) / 2 and len(remaining_objects) <= questions_left:
+        if best_split > total / 2 and total <= questions_left:
             return True
             
         return False
+
+    def _best_split(self, candidates, remaining_objects, remaining_features, total):
+        if candidates is None:
+            candidates = self._mask_of(remaining_objects)
+        _, masks = self._bitsets()
+        best_split = 0
+        for feature in remaining_features:
+            yes_count = _popcount(candidates & masks[feature])
+            no_count = total - yes_count
+            best_split = max(best_split, min(yes_count, no_count))
+        return best_split
     
     def play_game(self):
         """Starts a new guessing game with optimal guessing strategy"""
         print("Think of an object within the dataset, and I'll try to guess it!")
-        tree = self._build_tree(list(self.data.keys()), self.features)
+        self.play(ConsoleOracle(), say=print)
+
+    def play(self, oracle, say=None, max_questions=20):
+        """Plays one game against an oracle and returns a GameResult.
+
+        oracle.ask(feature) and oracle.guess(object_name) answer True for yes.
+        say, if given, is called with each message play_game would print.
+        """
+        say = say or (lambda message: None)
+        tree = self.get_tree()
         
         questions_asked = 0
-        max_questions = 20
         
-        # Track current state
-        remaining_objects = list(self.data.keys())
+        # Track current state, candidates as a bitmask over the objects
+        _, masks = self._bitsets()
+        remaining_objects = self._all_mask
         remaining_features = self.features.copy()
+        split_counts = SplitCounts(self, remaining_objects, self._feature_totals)
         
         # Start at the root
         node = tree
         
         while questions_asked < max_questions:
             # If we're at a leaf node or should start guessing
-            if node.object_name or self._should_guess(remaining_objects, remaining_features, max_questions - questions_asked):
+            if node.object_name or self._should_guess(remaining_objects, remaining_features,
+                                                      max_questions - questions_asked, split_counts):
                 # If we have a specific object node
                 if node.object_name and "," not in node.object_name:
-                    answer = input(f"Is it a {node.object_name}? (yes/no) ").lower()
+                    correct = oracle.guess(node.object_name)
                     questions_asked += 1
                     
-                    if answer == 'yes':
-                        print("I guessed it!")
-                        return
+                    if correct:
+                        say("I guessed it!")
+                        return GameResult(True, questions_asked, node.object_name)
                     else:
-                        print("I couldn't guess your object correctly.")
+                        say("I couldn't guess your object correctly.")
                         if questions_asked >= max_questions:
-                            print("I've reached my limit of 20 questions!")
-                        return
+                            say("I've reached my limit of 20 questions!")
+                        return GameResult(False, questions_asked, None)
                 else:
                     # Get the list of objects to guess
-                    objects_to_guess = node.object_name.split(",") if node.object_name else sorted(remaining_objects)
+                    objects_to_guess = node.object_name.split(",") if node.object_name else self._names_of(remaining_objects)
                     
                     for obj in objects_to_guess:
                         if questions_asked >= max_questions:
-                            print("I've reached my limit of 20 questions!")
-                            return
+                            say("I've reached my limit of 20 questions!")
+                            return GameResult(False, questions_asked, None)
                             
-                        answer = input(f"Is it a {obj}? (yes/no) ").lower()
+                        correct = oracle.guess(obj)
                         questions_asked += 1
                         
-                        if answer == 'yes':
-                            print("I guessed it!")
-                            return
+                        if correct:
+                            say("I guessed it!")
+                            return GameResult(True, questions_asked, obj)
                     
-                    print("I couldn't guess your object within 20 questions.")
-                    return
+                    say("I couldn't guess your object within 20 questions.")
+                    return GameResult(False, questions_asked, None)
             
             # Ask a question to navigate the tree
-            answer = input(f"{node.question}? (yes/no) ").lower()
+            answer = oracle.ask(node.question)
             questions_asked += 1
             
             # Update remaining features
             remaining_features.remove(node.question)
             
             # Update remaining objects based on answer
-            if answer == 'yes':
-                remaining_objects = [obj for obj in remaining_objects if self.data[obj][node.question] == 1]
+            if answer:
+                remaining_objects &= masks[node.question]
                 node = node.left
             else:
-                remaining_objects = [obj for obj in remaining_objects if self.data[obj][node.question] == 0]
+                remaining_objects &= ~masks[node.question]
                 node = node.right
+            split_counts.narrow(remaining_objects)
         
-        print("I've reached my limit of 20 questions and couldn't guess your object!")
+        say("I've reached my limit of 20 questions and couldn't guess your object!")
+        return GameResult(False, questions_asked, None)
 
 
-def main(dataset_path):
-    guesser = ObjectGuesser(dataset_path) 
+def main(dataset_path, **guesser_options):
+    guesser = ObjectGuesser(dataset_path, **guesser_options)
     while True:
         guesser.play_game()
         if input("Play again? (yes/no) ").lower() != 'yes':
             break
 
-main("/home/full_data.txt")
\ No newline at end of file
+_worker_guesser = None
+
+def _init_worker(csv_path, guesser_options):
+    global _worker_guesser
+    _worker_guesser = ObjectGuesser(csv_path, **guesser_options)
+    _worker_guesser.get_tree()
+
+def _play_secrets(secrets, max_questions):
+    guesser = _worker_guesser
+    return [(secret, guesser.play(SecretOracle(guesser.data, secret), max_questions=max_questions))
+            for secret in secrets]
+
+def evaluate(csv_path, workers=None, max_questions=20, chunk_size=64, **guesser_options):
+    """Plays one game for every object in the dataset and summarizes the question counts.
+
+    Games run in a process pool, each worker building (or, with tree_cache_dir,
+    loading) its own tree. Other keyword arguments go to ObjectGuesser.
+
+    Returns:
+        dict: games, success_rate, average/max questions, the distribution of
+        question counts and the objects that weren't guessed.
+    """
+    guesser = ObjectGuesser(csv_path, **guesser_options)
+    if guesser.tree_cache_dir:
+        guesser.get_tree()  # build and save the tree once here, so the workers just load it
+    secrets = sorted(guesser.data)
+    chunks = [secrets[i:i + chunk_size] for i in range(0, len(secrets), chunk_size)]
+
+    results = []
+    if workers == 1:
+        global _worker_guesser
+        _worker_guesser = guesser
+        for chunk in chunks:
+            results.extend(_play_secrets(chunk, max_questions))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(csv_path, guesser_options)) as executor:
+            for played in executor.map(_play_secrets, chunks, [max_questions] * len(chunks)):
+                results.extend(played)
+
+    questions = [result.questions for _, result in results]
+    return {
+        "games": len(results),
+        "success_rate": sum(result.guessed for _, result in results) / len(results) if results else 0.0,
+        "average_questions": sum(questions) / len(questions) if questions else 0.0,
+        "max_questions": max(questions, default=0),
+        "distribution": dict(sorted(Counter(questions).items())),
+        "failures": [secret for secret, result in results if not result.guessed],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play 20 questions over a yes/no feature dataset.")
+    parser.add_argument("dataset", nargs="?", default="/home/full_data.txt")
+    parser.add_argument("--tree-cache-dir", help="keep built trees here between runs")
+    parser.add_argument("--evaluate", action="store_true",
+                        help="play every object against itself and print question statistics")
+    parser.add_argument("--workers", type=int, default=None, help="processes used by --evaluate")
+    parser.add_argument("--columnar", action="store_true",
+                        help="load the dataset as a packed bit matrix, cached in a sidecar file")
+    parser.add_argument("--sidecar-dir", help="keep --columnar's sidecar here instead of next to the dataset")
+    parser.add_argument("--no-sidecar", action="store_true", help="don't read or write --columnar's sidecar")
+    parser.add_argument("--solver", default="greedy", choices=("greedy", "optimal"))
+    parser.add_argument("--objective", default="expected", choices=("expected", "worst"),
+                        help="what --solver optimal minimizes")
+    parser.add_argument("--time-budget", type=float, default=DEFAULT_TIME_BUDGET,
+                        help="seconds the optimal solver may spend before falling back to greedy")
+    args = parser.parse_args()
+
+    options = dict(tree_cache_dir=args.tree_cache_dir, columnar=args.columnar,
+                   sidecar=not args.no_sidecar and (args.sidecar_dir or True), solver=args.solver,
+                   objective=args.objective, time_budget=args.time_budget)
+    if args.evaluate:
+        print(json.dumps(evaluate(args.dataset, workers=args.workers, **options), indent=2))
+    else:
+        main(args.dataset, **options)
\ No newline at end of file
@@ -1,11 +1,31 @@
+import importlib
 import unittest
 from unittest.mock import patch, mock_open, MagicMock
 import io
 import sys
 import math
+import os
+import random
+import tempfile
+import time
 from contextlib import redirect_stdout
-from search_tree import TreeNode, ObjectGuesser
+game = importlib.import_module("20_questions_game")  # the file name isn't a valid identifier
+TreeNode, ObjectGuesser, SecretOracle, SplitCounts, evaluate = (
+    game.TreeNode, game.ObjectGuesser, game.SecretOracle, game.SplitCounts, game.evaluate)
+from session_server import CompiledTree, SessionServer
 
+try:
+    import numpy  # noqa: F401
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+
+def tree_shape(node):
+    """Nested tuples of a tree's questions and leaves, for comparing trees"""
+    if node is None:
+        return None
+    return (node.question, node.object_name, tree_shape(node.left), tree_shape(node.right))
 
 # used LLM to generate test cases
 
@@ -117,6 +137,60 @@ class TestObjectGuesser(unittest.TestCase):
         self.assertIsNotNone(tree.left)
         self.assertIsNotNone(tree.right)
     
+    @unittest.skipUnless(HAVE_NUMPY, "numpy not installed")
+    def test_build_tree_numpy_matches(self):
+        """Test that the NumPy builder produces the same tree as the default one"""
+        with patch('builtins.open', mock_open(read_data=self.csv_data)):
+            numpy_guesser = ObjectGuesser("fake_path.csv", use_numpy=True)
+        
+        objects = ["apple", "banana", "tomato", "lemon"]
+        self.assertEqual(tree_shape(numpy_guesser._build_tree(objects, numpy_guesser.features)),
+                         tree_shape(self.guesser._build_tree(objects, self.guesser.features)))
+    
+    def test_lazy_tree_matches(self):
+        """Test that a lazy tree expands into the same tree and keeps its cache bounded"""
+        with patch('builtins.open', mock_open(read_data=self.csv_data)):
+            lazy_guesser = ObjectGuesser("fake_path.csv", lazy=True, lazy_cache_size=2)
+        
+        self.assertEqual(tree_shape(lazy_guesser.get_tree()), tree_shape(self.guesser.get_tree()))
+        self.assertLessEqual(len(lazy_guesser._lazy_nodes), 2)
+    
+    def test_build_optimal_tree(self):
+        """Test that the optimal tree needs no more questions on average than the greedy one"""
+        with patch('builtins.open', mock_open(read_data=self.csv_data)):
+            optimal_guesser = ObjectGuesser("fake_path.csv", solver="optimal")
+        
+        def total_questions(tree):
+            # questions plus guesses each object needs, summed over all objects
+            totals, pending = {}, [(tree, 0)]
+            while pending:
+                node, depth = pending.pop()
+                if node.question is None:
+                    for position, name in enumerate(node.object_name.split(",")):
+                        totals[name] = depth + position + 1
+                else:
+                    pending += [(node.left, depth + 1), (node.right, depth + 1)]
+            return totals
+        
+        optimal = total_questions(optimal_guesser.get_tree())
+        greedy = total_questions(self.guesser.get_tree())
+        self.assertFalse(optimal_guesser.fell_back)
+        self.assertEqual(sorted(optimal), sorted(greedy))
+        self.assertLessEqual(sum(optimal.values()), sum(greedy.values()))
+
+    def test_build_deep_tree(self):
+        """Test that one-hot data, whose tree is deeper than the recursion limit, still builds"""
+        count = sys.getrecursionlimit() + 100
+        csv_data = "object," + ",".join(f"f{i}" for i in range(count)) + "\n" + "".join(
+            f"o{i:05d}," + ",".join("1" if j == i else "0" for j in range(count)) + "\n"
+            for i in range(count))
+        with patch('builtins.open', mock_open(read_data=csv_data)):
+            guesser = ObjectGuesser("fake_path.csv", solver="optimal")
+        tree = guesser.get_tree()
+        self.assertTrue(guesser.fell_back)
+        self.assertEqual(tree.question, "f0")
+        self.assertEqual(tree.left.object_name, "o00000")
+    
     def test_build_tree_identical_objects(self):
         """Test tree building with objects that have identical features"""
         # Create mock data with two identical objects
@@ -142,6 +216,38 @@ class TestObjectGuesser(unittest.TestCase):
                 self.assertIn("obj1", node.object_name)
                 self.assertIn("obj2", node.object_name)
     
+    def test_feature_bitsets(self):
+        """Test that features compile to one bitmask per feature over sorted objects"""
+        names, masks = self.guesser._bitsets()
+        self.assertEqual(names, ["apple", "banana", "lemon", "tomato"])
+        
+        # apple (bit 0) and tomato (bit 3) are red
+        self.assertEqual(masks["red"], 0b1001)
+        self.assertEqual(self.guesser._names_of(masks["red"]), ["apple", "tomato"])
+        self.assertEqual(self.guesser._mask_of(["tomato", "apple"]), masks["red"])
+        
+        # candidate sets stay alphabetical after AND/NOT splits
+        not_round = self.guesser._mask_of(names) & ~masks["round"]
+        self.assertEqual(self.guesser._names_of(not_round), ["banana"])
+    
+    def test_tree_cache(self):
+        """Test that trees are built once and reloaded from disk by later guessers"""
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "data.csv")
+            with open(csv_path, 'w') as f:
+                f.write(self.csv_data)
+            cache_dir = os.path.join(directory, "trees")
+            
+            guesser = ObjectGuesser(csv_path, tree_cache_dir=cache_dir)
+            tree = guesser.get_tree()
+            self.assertIs(guesser.get_tree(), tree)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            
+            reloaded = ObjectGuesser(csv_path, tree_cache_dir=cache_dir)
+            with patch.object(reloaded, '_build_tree') as mock_build_tree:
+                self.assertEqual(tree_shape(reloaded.get_tree()), tree_shape(tree))
+                mock_build_tree.assert_not_called()
+    
     def test_should_guess_single_object(self):
         """Test should_guess with a single object remaining"""
         # With only one object, should always guess
@@ -223,5 +329,199 @@ class TestObjectGuesser(unittest.TestCase):
             output = captured_output.getvalue()
             self.assertIn("I guessed it!", output)
 
+class TestSelfPlay(unittest.TestCase):
+    """Tests for playing against an answer oracle"""
+    
+    def setUp(self):
+        self.csv_data = "object,red,round,sweet\napple,1,1,1\nbanana,0,0,1\ntomato,1,1,0\nlemon,0,1,0"
+        self.directory = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.directory.name, "data.csv")
+        with open(self.csv_path, 'w') as f:
+            f.write(self.csv_data)
+    
+    def tearDown(self):
+        self.directory.cleanup()
+    
+    def test_play_with_secret_oracle(self):
+        """Test that a truthful oracle's object is found without printing anything"""
+        guesser = ObjectGuesser(self.csv_path)
+        for secret in guesser.data:
+            captured_output = io.StringIO()
+            with redirect_stdout(captured_output):
+                result = guesser.play(SecretOracle(guesser.data, secret))
+            self.assertTrue(result.guessed)
+            self.assertEqual(result.guess, secret)
+            self.assertLessEqual(result.questions, 20)
+            self.assertEqual(captured_output.getvalue(), "")
+    
+    def test_evaluate(self):
+        """Test the summary of playing every object"""
+        report = evaluate(self.csv_path, workers=1)
+        self.assertEqual(report["games"], 4)
+        self.assertEqual(report["success_rate"], 1.0)
+        self.assertEqual(sum(report["distribution"].values()), 4)
+        self.assertEqual(report["failures"], [])
+
+
+
+@unittest.skipUnless(HAVE_NUMPY, "numpy not installed")
+class TestColumnarLoader(unittest.TestCase):
+    """Tests for loading datasets as packed bit columns"""
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.directory.name, "data.csv")
+        with open(self.csv_path, 'w') as f:
+            f.write("object,red,round,sweet\ntomato,1,1,0\napple,1,1,1\nlemon,0,1,0\nbanana,0,0,1")
+        self.guesser = ObjectGuesser(self.csv_path)
+    
+    def tearDown(self):
+        self.directory.cleanup()
+    
+    def assertLoadsSame(self, **options):
+        columnar_guesser = ObjectGuesser(self.csv_path, columnar=True, **options)
+        self.assertEqual(columnar_guesser.features, self.guesser.features)
+        self.assertEqual(dict(columnar_guesser.data), self.guesser.data)
+        self.assertEqual(columnar_guesser._bitsets(), self.guesser._bitsets())
+    
+    def test_columnar_load(self):
+        """Test that the packed loader matches the dict loader, with and without its sidecar"""
+        for _ in range(2):  # the second load maps the sidecar written by the first
+            self.assertLoadsSame()
+        self.assertTrue(os.path.exists(self.csv_path + ".cols.npy"))
+    
+    def test_columnar_load_sidecar_options(self):
+        """Test that the sidecar can be kept in its own directory or not written at all"""
+        self.assertLoadsSame(sidecar=False)
+        self.assertEqual(os.listdir(self.directory.name), ["data.csv"])
+        
+        sidecar_dir = os.path.join(self.directory.name, "sidecars")
+        for _ in range(2):
+            self.assertLoadsSame(sidecar=sidecar_dir)
+        self.assertEqual(len(os.listdir(sidecar_dir)), 2)
+        self.assertFalse(os.path.exists(self.csv_path + ".cols.npy"))
+    
+    def test_columnar_load_rejects_bad_values(self):
+        """Test that the packed loader reports the line of an invalid value"""
+        with open(self.csv_path, 'w') as f:
+            f.write("object,red,round\napple,1,1\nbanana,0,2\n")
+        with self.assertRaisesRegex(ValueError, ":3:"):
+            ObjectGuesser(self.csv_path, columnar=True)
+    
+    def test_columnar_load_rejects_malformed_cells(self):
+        """Test that an empty cell next to a two-digit one is rejected, as the dict loader does"""
+        for row in ("x,1", "x,1,1,1", "x,2,0", "x,,11"):  # the dict loader rejects the last
+            with open(self.csv_path, 'w') as f:
+                f.write("object,a,b\n" + row + "\n")
+            with self.assertRaises(ValueError, msg=row):
+                ObjectGuesser(self.csv_path, columnar=True, sidecar=False)
+        with self.assertRaises(ValueError):
+            ObjectGuesser(self.csv_path)
+
+
+class TestSessionServer(unittest.TestCase):
+    """Tests for the line protocol session server"""
+    
+    def setUp(self):
+        # few features for many objects, so some objects share every answer and get guessed in turn
+        rng = random.Random(0)
+        rows = [f"o{i}," + ",".join(str(rng.randint(0, 1)) for _ in range(6)) for i in range(40)]
+        self.directory = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.directory.name, "data.csv")
+        with open(self.csv_path, 'w') as f:
+            f.write("object," + ",".join(f"f{j}" for j in range(6)) + "\n" + "\n".join(rows))
+        self.guesser = ObjectGuesser(self.csv_path)
+    
+    def tearDown(self):
+        self.directory.cleanup()
+    
+    def play_session(self, server, oracle):
+        """Plays one game over the protocol and returns its DONE line"""
+        replies = server.handle_line("NEW")
+        self.assertEqual(replies[0].split()[0], "SESSION")
+        session_id = replies[0].split()[1]
+        while True:
+            kind, reply_id, rest = replies[-1].split(" ", 2)
+            self.assertEqual(reply_id, session_id)
+            if kind == "DONE":
+                return replies[-1]
+            self.assertEqual(kind, "ASK")
+            if rest.startswith("Is it a "):
+                yes = oracle.guess(rest[len("Is it a "):-1])
+            else:
+                yes = oracle.ask(rest[:-1])
+            replies = server.handle_line(f"{session_id} {'yes' if yes else 'no'}")
+    
+    def test_sessions_match_play(self):
+        """Test that every game over the protocol ends just as play() does"""
+        for max_questions in (20, 3):  # 3 also runs games out of questions
+            server = SessionServer(CompiledTree(self.guesser, max_questions))
+            for secret in self.guesser.data:
+                result = self.guesser.play(SecretOracle(self.guesser.data, secret), max_questions=max_questions)
+                done = self.play_session(server, SecretOracle(self.guesser.data, secret))
+                _, session_id, outcome = done.split(" ", 2)
+                if result.guessed:
+                    self.assertEqual(outcome, f"guessed {result.questions} {result.guess}")
+                else:
+                    self.assertEqual(outcome, f"failed {result.questions}")
+            self.assertEqual(server.sessions, {})
+            stats = server._server_stats()
+            self.assertEqual(stats["guessed"] + stats["failed"], len(self.guesser.data))
+    
+    def test_evict_idle(self):
+        """Test that only sessions idle past the timeout are evicted"""
+        server = SessionServer(CompiledTree(self.guesser), idle_timeout=60)
+        first = server.handle_line("NEW")[0].split()[1]
+        second = server.handle_line("NEW")[0].split()[1]
+        server.sessions[first].last_active -= 100
+        self.assertEqual(server.evict_idle(now=time.monotonic()), 1)
+        self.assertEqual(list(server.sessions), [second])
+        self.assertEqual(server.handle_line(f"{first} yes"), [f"ERROR {first} unknown session"])
+        self.assertEqual(server.evict_idle(now=time.monotonic() + 61), 1)
+        self.assertEqual(server._server_stats()["evicted"], 2)
+    
+    def test_end_and_errors(self):
+        """Test END, INFO and the replies to unknown sessions and bad answers"""
+        server = SessionServer(CompiledTree(self.guesser))
+        session_id = server.handle_line("NEW")[0].split()[1]
+        self.assertEqual(server.handle_line(f"{session_id} maybe"), [f"ERROR {session_id} expected yes or no"])
+        self.assertTrue(server.handle_line(f"INFO {session_id}")[0].startswith(f"INFO {session_id} {{"))
+        self.assertEqual(server.handle_line(f"END {session_id}"), [f"ENDED {session_id}"])
+        self.assertEqual(server.handle_line(f"END {session_id}"), [f"ERROR {session_id} unknown session"])
+        self.assertEqual(server.handle_line(f"{session_id} no"), [f"ERROR {session_id} unknown session"])
+        self.assertEqual(server.handle_line("INFO 99"), ["ERROR 99 unknown session"])
+        self.assertEqual(server.handle_line(""), [])
+        self.assertEqual(server._server_stats()["ended"], 1)
+
+
+
+class TestSplitCounts(unittest.TestCase):
+    """Tests for the per-game feature counts"""
+    
+    def test_narrow_matches_popcounts(self):
+        """Test that narrowed counts equal fresh popcounts, counting objects one by one too"""
+        rng = random.Random(1)
+        rows = [f"o{i}," + ",".join(str(rng.randint(0, 1)) for _ in range(8)) for i in range(64)]
+        csv_data = "object," + ",".join(f"f{j}" for j in range(8)) + "\n" + "\n".join(rows)
+        with patch('builtins.open', mock_open(read_data=csv_data)):
+            guesser = ObjectGuesser("fake_path.csv")
+        _, masks = guesser._bitsets()
+        
+        # a low ratio sends sets of up to 15 of the 64 objects down the per-object branch
+        with patch.object(game, 'PER_OBJECT_COUNT_RATIO', 4), \
+                patch.object(guesser, '_names_of', wraps=guesser._names_of) as names_of:
+            for _ in range(20):
+                split_counts = SplitCounts(guesser, guesser._all_mask, guesser._feature_totals)
+                while split_counts.total > 1:
+                    # keep a random subset, sometimes most of the candidates so the removed side is counted
+                    keep_rate = rng.choice((0.2, 0.5, 0.9))
+                    kept = sum(1 << i for i in range(64) if split_counts.candidates >> i & 1 and rng.random() < keep_rate)
+                    split_counts.narrow(kept)
+                    self.assertEqual(split_counts.total, bin(kept).count("1"))
+                    self.assertEqual(split_counts.counts,
+                                     {f: bin(kept & mask).count("1") for f, mask in masks.items()})
+            self.assertTrue(names_of.called)
+
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
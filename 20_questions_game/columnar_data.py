@@ -0,0 +1,194 @@
+import csv
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+import numpy as np
+
+# Streaming loader for large yes/no datasets.
+#
+# Rows are read in chunks and packed straight into one bit row per feature
+# (bit i = object i, objects in alphabetical order), which is the same layout
+# ObjectGuesser's bitmasks use. A million objects by 300 features takes about
+# 37 MB instead of hundreds of millions of Python ints. The packed matrix can be
+# saved to a sidecar next to the CSV (or in a directory of its own, for read-only
+# datasets) and memory-mapped by later loads, which then only read the name table.
+
+SIDECAR_VERSION = 1
+DEFAULT_CHUNK_ROWS = 1 << 16  # a multiple of 8, so every chunk packs into whole bytes
+BIT_VALUES = frozenset(('0', '1'))
+
+
+class ColumnarData(Mapping):
+    """Read-only {object: {feature: 0 or 1}} view over a packed bit matrix.
+
+    Args:
+        names (list): Object names, sorted.
+        features (list): Feature names, one per row of packed.
+        packed (np.ndarray): uint8 array of shape (features, ceil(objects / 8)),
+            bits in little-endian order. May be a read-only memory map.
+    """
+
+    def __init__(self, names, features, packed):
+        self.names = names
+        self.features = features
+        self.packed = packed
+        self.column = {feature: j for j, feature in enumerate(features)}
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = {name: i for i, name in enumerate(self.names)}
+        return self._index
+
+    def __getitem__(self, name):
+        i = self.index[name]
+        bits = (self.packed[:, i >> 3] >> (i & 7)) & 1
+        return dict(zip(self.features, bits.tolist()))
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def feature_mask(self, feature):
+        """Returns the feature's column as an int with bit i set for each yes object"""
+        return int.from_bytes(self.packed[self.column[feature]].tobytes(), 'little')
+
+    def matrix(self, features=None):
+        """Returns the uint8 objects x features matrix (all features by default)"""
+        rows = self.packed if features is None else self.packed[[self.column[f] for f in features]]
+        unpacked = np.unpackbits(rows, axis=1, count=len(self.names), bitorder='little')
+        return np.ascontiguousarray(unpacked.T)
+
+
+def _sidecar_paths(csv_path, directory=None):
+    base = csv_path
+    if directory is not None:
+        # CSVs of the same name from different directories mustn't share a sidecar
+        digest = hashlib.sha1(os.path.abspath(csv_path).encode()).hexdigest()[:12]
+        base = os.path.join(directory, f"{os.path.basename(csv_path)}.{digest}")
+    return base + '.cols.json', base + '.cols.npy'
+
+
+def _source_stamp(csv_path):
+    info = os.stat(csv_path)
+    return {"size": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+
+def _load_sidecar(csv_path, directory=None):
+    meta_path, matrix_path = _sidecar_paths(csv_path, directory)
+    try:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta.get("version") != SIDECAR_VERSION or meta.get("source") != _source_stamp(csv_path):
+            return None
+        packed = np.load(matrix_path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    if packed.shape != (len(meta["features"]), (len(meta["names"]) + 7) // 8):
+        return None
+    return ColumnarData(meta["names"], meta["features"], packed)
+
+
+def _save_sidecar(csv_path, data, directory=None):
+    meta_path, matrix_path = _sidecar_paths(csv_path, directory)
+    meta = {"version": SIDECAR_VERSION, "source": _source_stamp(csv_path),
+            "features": data.features, "names": data.names}
+    suffix = f".{os.getpid()}.tmp"
+    try:
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        np.save(matrix_path + suffix + '.npy', data.packed)
+        os.replace(matrix_path + suffix + '.npy', matrix_path)
+        with open(meta_path + suffix, 'w') as f:
+            json.dump(meta, f, separators=(',', ':'))
+        os.replace(meta_path + suffix, meta_path)  # written last, so it only ever describes a complete matrix
+    except OSError:
+        pass  # a read-only dataset directory just means no sidecar
+
+
+def _pack_chunk(csv_path, rows, lines, n_features):
+    """Validates a chunk of CSV rows and returns their names and packed feature bits"""
+    cells = []
+    for row, line in zip(rows, lines):
+        if len(row) != n_features + 1:
+            raise ValueError(f"{csv_path}:{line}: expected {n_features} values, got {len(row) - 1}")
+        # every cell on its own, a total length check lets "" next to "11" through
+        if not BIT_VALUES.issuperset(row[1:]):
+            bad = next(value for value in row[1:] if value not in BIT_VALUES)
+            raise ValueError(f"{csv_path}:{line}: values must be 0 or 1, got {bad!r}")
+        cells.append(''.join(row[1:]))
+    bits = np.frombuffer(''.join(cells).encode('ascii'), dtype=np.uint8) - ord('0')
+    bits = bits.reshape(len(rows), n_features)
+    return [row[0] for row in rows], np.packbits(bits, axis=0, bitorder='little').T
+
+
+def load_columnar(csv_path, chunk_rows=DEFAULT_CHUNK_ROWS, sidecar=True):
+    """Streams a yes/no CSV into a ColumnarData.
+
+    Args:
+        csv_path (str): CSV with a header of object column then feature names,
+            and one row of 0/1 values per object.
+        chunk_rows (int): Rows parsed and packed at a time, rounded up to a multiple of 8.
+        sidecar (bool or str): Reuse (or write) a packed copy next to the CSV, which is
+            memory-mapped on later loads while the CSV's size and mtime are unchanged.
+            A directory name keeps the copy there instead, False disables it.
+
+    Returns:
+        tuple: (ColumnarData, features list)
+
+    Raises:
+        ValueError: For a row of the wrong width, a value other than 0 or 1, or a
+            repeated object name.
+    """
+    directory = sidecar if isinstance(sidecar, str) else None
+    if sidecar:
+        data = _load_sidecar(csv_path, directory)
+        if data is not None:
+            return data, data.features
+
+    chunk_rows = max(8, (chunk_rows + 7) // 8 * 8)
+    names, chunks = [], []
+    seen = set()
+    with open(csv_path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        features = next(reader)[1:]
+        while True:
+            rows, lines = [], []
+            for row in reader:
+                if row:  # blank lines are skipped
+                    rows.append(row)
+                    lines.append(reader.line_num)
+                    if len(rows) == chunk_rows:
+                        break
+            if not rows:
+                break
+            chunk_names, packed = _pack_chunk(csv_path, rows, lines, len(features))
+            for name, line in zip(chunk_names, lines):
+                if name in seen:
+                    raise ValueError(f"{csv_path}:{line}: repeated object {name!r}")
+                seen.add(name)
+            names.extend(chunk_names)
+            chunks.append(packed)
+
+    packed = np.concatenate(chunks, axis=1) if chunks else np.zeros((len(features), 0), dtype=np.uint8)
+
+    # bits must follow alphabetical order, which a CSV rarely is in
+    order = sorted(range(len(names)), key=names.__getitem__)
+    if order != list(range(len(names))):
+        order = np.array(order, dtype=np.intp)
+        for j in range(len(features)):
+            column = np.unpackbits(packed[j], count=len(names), bitorder='little')[order]
+            packed[j] = np.packbits(column, bitorder='little')
+        names = [names[i] for i in order]
+
+    data = ColumnarData(names, features, packed)
+    if sidecar:
+        _save_sidecar(csv_path, data, directory)
+    return data, features
@@ -0,0 +1,153 @@
+import time
+from functools import lru_cache
+
+# Exact search for the question tree with the fewest expected (or worst-case)
+# questions, where a final "Is it a ...?" guess counts as a question too.
+#
+# Which features were already asked doesn't matter: on the objects that remain
+# they all have one value, so they can't split anything. A subtree's best cost
+# is therefore a function of its candidate set alone, and the search memoizes
+# on candidate bitmasks. Any set may also be settled by guessing its objects one
+# by one, which is cheaper than asking for small sets (two objects cost 1 + 2
+# guesses, against 2 + 2 + 2 with a question first).
+#
+# Costs are totals over the set's objects for "expected" (divide by the number
+# of objects for the mean) and the deepest object for "worst". The best cost a
+# set of n objects could have with ideal splits is a lower bound for any real
+# set of that size. It prunes features whose split can't beat the best found so
+# far, and features are tried most balanced first, so once one is pruned the
+# rest are too.
+
+OBJECTIVES = ("expected", "worst")
+DEFAULT_TIME_BUDGET = 5.0  # seconds
+DEFAULT_MAX_STATES = 1_000_000  # memoized candidate sets
+DEFAULT_MAX_DEPTH = 500  # nested subproblems, well inside Python's default recursion limit of 1000
+
+
+class SearchBudgetExceeded(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def _ideal_total(n):
+    """Least total questions for n objects if any split were available.
+
+    An even split is always best here (checked against the full split DP up to 1500).
+    """
+    if n <= 1:
+        return n
+    return min(n * (n + 1) // 2, n + _ideal_total(n // 2) + _ideal_total(n - n // 2))
+
+
+@lru_cache(maxsize=None)
+def _ideal_depth(n):
+    if n <= 1:
+        return n
+    return min(n, 1 + _ideal_depth(n - n // 2))
+
+
+def _popcount(mask):
+    return bin(mask).count("1")
+
+
+class OptimalTreeSearch:
+    """Branch and bound over candidate bitmasks.
+
+    Args:
+        masks (list): One int bitmask per feature, bit i set if object i answers yes.
+        objective (str): "expected" minimizes the mean number of questions,
+            "worst" the most any object needs.
+        time_budget (float): Seconds before the search gives up, or None.
+        max_states (int): Memoized candidate sets before the search gives up.
+        max_depth (int): Subproblems nested inside each other before the search
+            gives up, which happens on data where each question only rules out
+            one object at a time.
+    """
+
+    def __init__(self, masks, objective="expected", time_budget=DEFAULT_TIME_BUDGET,
+                 max_states=DEFAULT_MAX_STATES, max_depth=DEFAULT_MAX_DEPTH):
+        if objective not in OBJECTIVES:
+            raise ValueError(f"unknown objective {objective!r}, expected one of {OBJECTIVES}")
+        self.masks = masks
+        self.worst = objective == "worst"
+        self.lower_bound = _ideal_depth if self.worst else _ideal_total
+        self.time_budget = time_budget
+        self.max_states = max_states
+        self.max_depth = max_depth
+        self.best = {}  # candidates -> (cost, feature index, or None to guess them in turn)
+        self.bounds = {}  # candidates -> proven lower bound, for sets that were cut off
+        self.deadline = None
+        self.visits = 0
+
+    def _guess_cost(self, n):
+        return n if self.worst else n * (n + 1) // 2
+
+    def _combine(self, n, yes_cost, no_cost):
+        return 1 + max(yes_cost, no_cost) if self.worst else n + yes_cost + no_cost
+
+    def _child_limit(self, n, limit, other_cost):
+        """Cost a child must stay under for the parent to stay under limit"""
+        if self.worst:
+            return limit - 1 if other_cost < limit - 1 else 0
+        return limit - n - other_cost
+
+    def search(self, candidates):
+        """Returns the least cost for the candidates, filling self.best along the way.
+
+        Raises:
+            SearchBudgetExceeded: If the time, state or depth budget ran out first.
+        """
+        if self.time_budget is not None:
+            self.deadline = time.perf_counter() + self.time_budget
+        n = _popcount(candidates)
+        return self._solve(candidates, n, self._guess_cost(n) + 1, 0)
+
+    def _solve(self, candidates, n, limit, depth):
+        """Exact least cost if it is below limit, otherwise some lower bound >= limit"""
+        if n == 1:
+            return 1
+        known = self.best.get(candidates)
+        if known is not None:
+            return known[0]
+        lower = max(self.lower_bound(n), self.bounds.get(candidates, 0))
+        if lower >= limit:
+            return lower
+
+        if depth >= self.max_depth:
+            raise SearchBudgetExceeded("depth budget exceeded")
+        self.visits += 1
+        if self.visits & 1023 == 0:
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                raise SearchBudgetExceeded("time budget exceeded")
+            if len(self.best) + len(self.bounds) > self.max_states:
+                raise SearchBudgetExceeded("state budget exceeded")
+
+        splits = []
+        for j, mask in enumerate(self.masks):
+            yes = candidates & mask
+            yes_count = _popcount(yes)
+            if 0 < yes_count < n:
+                splits.append((-min(yes_count, n - yes_count), j, yes, yes_count))
+        splits.sort()
+
+        guess_cost = self._guess_cost(n)
+        best_cost, best_feature = guess_cost, None
+        best_limit = min(limit, guess_cost)  # anything must beat guessing to be worth asking
+        for _, j, yes, yes_count in splits:
+            no, no_count = candidates & ~yes, n - yes_count
+            yes_lower, no_lower = self.lower_bound(yes_count), self.lower_bound(no_count)
+            if self._combine(n, yes_lower, no_lower) >= best_limit:
+                break  # less balanced splits only have higher bounds
+            yes_cost = self._solve(yes, yes_count, self._child_limit(n, best_limit, no_lower), depth + 1)
+            if self._combine(n, yes_cost, no_lower) >= best_limit:
+                continue
+            no_cost = self._solve(no, no_count, self._child_limit(n, best_limit, yes_cost), depth + 1)
+            cost = self._combine(n, yes_cost, no_cost)
+            if cost < best_limit:
+                best_cost, best_feature, best_limit = cost, j, cost
+
+        if best_feature is None and guess_cost >= limit:
+            self.bounds[candidates] = limit  # nothing beat limit, which is all we learned
+            return limit
+        self.best[candidates] = (best_cost, best_feature)
+        return best_cost
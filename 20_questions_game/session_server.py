@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import sys
+import time
+from collections import OrderedDict
+
+game = importlib.import_module("20_questions_game")  # the file name isn't a valid identifier
+
+# Serves many 20 questions games at once over a line protocol, on a local TCP
+# socket or stdin/stdout.
+#
+#   NEW                  -> SESSION <id>, then ASK <id> <prompt>
+#   <id> yes|no          -> ASK <id> <prompt>, or DONE <id> guessed <questions> <name>
+#                           or DONE <id> failed <questions>
+#   INFO <id>            -> INFO <id> <json of the session's cursor and latencies>
+#   END <id>             -> ENDED <id>
+#   STATS                -> STATS <json of server-wide counters>
+#
+# Every session shares one CompiledTree, built once from the dataset. A session
+# is just a cursor into it: which node it is at, how many questions it has used
+# and how far into a list of guesses it is. The remaining candidates are implied
+# by the node, so they aren't stored per session either.
+
+DEFAULT_IDLE_TIMEOUT = 300.0  # seconds without an answer before a session is dropped
+MAX_QUESTIONS = 20
+
+
+class CompiledTree:
+    """Flat, read-only copy of an ObjectGuesser's tree with its guessing decisions.
+
+    Node i asks questions[i] and moves to yes_child[i] or no_child[i] (-1 where
+    no object is left), unless guesses[i] is set, in which case the game guesses
+    those names in order. play() decides when to start guessing from the
+    candidates, remaining features and questions left, which all follow from the
+    node, so the decision is made here once for every node.
+    """
+
+    def __init__(self, guesser, max_questions=MAX_QUESTIONS):
+        self.max_questions = max_questions
+        questions, yes_child, no_child, guesses = [], [], [], []
+        _, masks = guesser._bitsets()
+
+        def add(node, candidates, features, depth):
+            node_id = len(questions)
+            if node.object_name:
+                guess = tuple(node.object_name.split(","))
+            elif guesser._should_guess(candidates, features, max_questions - depth):
+                guess = tuple(guesser._names_of(candidates))
+            else:
+                guess = None
+            questions.append(node.question if guess is None else None)
+            yes_child.append(-1)
+            no_child.append(-1)
+            guesses.append(guess)
+            if guess is None:
+                remaining = [f for f in features if f != node.question]
+                mask = masks[node.question]
+                pending.append((node.right, candidates & ~mask, remaining, depth + 1, no_child, node_id))
+                pending.append((node.left, candidates & mask, remaining, depth + 1, yes_child, node_id))
+            return node_id
+
+        root = guesser.get_tree()
+        pending = []
+        add(root, guesser._all_mask, list(guesser.features), 0)
+        while pending:
+            node, candidates, features, depth, children, parent = pending.pop()
+            if node is not None and depth < max_questions:
+                children[parent] = add(node, candidates, features, depth)
+
+        self.questions = tuple(questions)
+        self.yes_child = tuple(yes_child)
+        self.no_child = tuple(no_child)
+        self.guesses = tuple(guesses)
+
+
+class Session:
+    """One player's cursor into the shared tree, plus its latency metrics"""
+
+    __slots__ = ("node", "questions", "guess_index", "last_active", "answers", "latency_total", "latency_max")
+
+    def __init__(self):
+        self.node = 0
+        self.questions = 0
+        self.guess_index = None  # position in the node's guesses once guessing has started
+        self.last_active = time.monotonic()
+        self.answers = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def info(self):
+        return {
+            "node": self.node,
+            "questions": self.questions,
+            "answers": self.answers,
+            "mean_latency_ms": 1000 * self.latency_total / self.answers if self.answers else 0.0,
+            "max_latency_ms": 1000 * self.latency_max,
+        }
+
+
+class SessionServer:
+    """Runs any number of game sessions over one CompiledTree.
+
+    Args:
+        tree (CompiledTree): The shared tree, never modified.
+        idle_timeout (float): Seconds a session may go without input before it is evicted.
+    """
+
+    def __init__(self, tree, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.tree = tree
+        self.idle_timeout = idle_timeout
+        self.sessions = OrderedDict()  # least recently active first
+        self.ids = itertools.count(1)
+        self.stats = {"started": 0, "guessed": 0, "failed": 0, "ended": 0, "evicted": 0,
+                      "answers": 0, "latency_total": 0.0, "latency_max": 0.0}
+
+    def handle_line(self, line):
+        """Handles one protocol line and returns the reply lines"""
+        start = time.perf_counter()
+        parts = line.strip().split(maxsplit=1)
+        if not parts:
+            return []
+        command = parts[0].upper()
+
+        if command == "NEW":
+            session_id = str(next(self.ids))
+            session = self.sessions[session_id] = Session()
+            self.stats["started"] += 1
+            return [f"SESSION {session_id}"] + self._advance(session_id, session)
+        if command == "STATS":
+            return ["STATS " + json.dumps(self._server_stats())]
+        if command in ("INFO", "END"):
+            session_id = parts[1].strip() if len(parts) > 1 else ""
+            session = self.sessions.get(session_id)
+            if session is None:
+                return [f"ERROR {session_id} unknown session"]
+            if command == "INFO":
+                return [f"INFO {session_id} " + json.dumps(session.info())]
+            self._finish(session_id, session, "ended")
+            return [f"ENDED {session_id}"]
+
+        session_id = parts[0]
+        session = self.sessions.get(session_id)
+        if session is None:
+            return [f"ERROR {session_id} unknown session"]
+        answer = parts[1].strip().lower() if len(parts) > 1 else ""
+        if answer not in ("yes", "no"):
+            return [f"ERROR {session_id} expected yes or no"]
+
+        self.sessions.move_to_end(session_id)
+        session.last_active = time.monotonic()
+        replies = self._answer(session_id, session, answer == "yes")
+
+        elapsed = time.perf_counter() - start
+        session.answers += 1
+        session.latency_total += elapsed
+        session.latency_max = max(session.latency_max, elapsed)
+        self.stats["answers"] += 1
+        self.stats["latency_total"] += elapsed
+        self.stats["latency_max"] = max(self.stats["latency_max"], elapsed)
+        return replies
+
+    def _answer(self, session_id, session, yes):
+        tree = self.tree
+        session.questions += 1
+        if session.guess_index is None:
+            session.node = tree.yes_child[session.node] if yes else tree.no_child[session.node]
+            if session.node < 0:
+                return self._finish(session_id, session, "failed")
+            return self._advance(session_id, session)
+
+        if yes:
+            return self._finish(session_id, session, "guessed",
+                                tree.guesses[session.node][session.guess_index])
+        session.guess_index += 1
+        return self._advance(session_id, session)
+
+    def _advance(self, session_id, session):
+        """Returns the session's next prompt, or its result if the game is over"""
+        tree = self.tree
+        if session.questions >= tree.max_questions:
+            return self._finish(session_id, session, "failed")
+
+        guesses = tree.guesses[session.node]
+        if guesses is None:
+            return [f"ASK {session_id} {tree.questions[session.node]}?"]
+        if session.guess_index is None:
+            session.guess_index = 0
+        if session.guess_index >= len(guesses):
+            return self._finish(session_id, session, "failed")
+        return [f"ASK {session_id} Is it a {guesses[session.guess_index]}?"]
+
+    def _finish(self, session_id, session, outcome, name=None):
+        del self.sessions[session_id]
+        self.stats[outcome] += 1
+        if outcome == "guessed":
+            return [f"DONE {session_id} guessed {session.questions} {name}"]
+        if outcome == "failed":
+            return [f"DONE {session_id} failed {session.questions}"]
+        return []
+
+    def evict_idle(self, now=None):
+        """Drops sessions that have been idle longer than idle_timeout"""
+        deadline = (now or time.monotonic()) - self.idle_timeout
+        evicted = 0
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if session.last_active > deadline:
+                break
+            del self.sessions[session_id]
+            evicted += 1
+        self.stats["evicted"] += evicted
+        return evicted
+
+    def _server_stats(self):
+        stats = dict(self.stats)
+        stats["active"] = len(self.sessions)
+        answers = stats["answers"]
+        stats["mean_latency_ms"] = 1000 * stats.pop("latency_total") / answers if answers else 0.0
+        stats["max_latency_ms"] = 1000 * stats.pop("latency_max")
+        return stats
+
+    async def evict_forever(self):
+        while True:
+            await asyncio.sleep(max(self.idle_timeout / 2, 0.01))
+            self.evict_idle()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                replies = self.handle_line(line.decode(errors="replace"))
+                if replies:
+                    writer.write(("\n".join(replies) + "\n").encode())
+                    await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve_socket(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        evictor = asyncio.create_task(self.evict_forever())
+        address = server.sockets[0].getsockname()
+        print(f"serving on {address[0]}:{address[1]}", file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            evictor.cancel()
+
+    async def serve_stdio(self):
+        loop = asyncio.get_running_loop()
+        evictor = asyncio.create_task(self.evict_forever())
+        try:
+            while True:
+                line = await loop.run_in_executor(None, sys.stdin.readline)
+                if not line:
+                    break
+                for reply in self.handle_line(line):
+                    print(reply, flush=True)
+        finally:
+            evictor.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve concurrent 20 questions sessions over a line protocol.")
+    parser.add_argument("dataset", help="CSV of objects and yes/no features")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stdio", action="store_true", help="speak the protocol on stdin/stdout instead")
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT)
+    parser.add_argument("--tree-cache-dir", help="keep built trees here between runs")
+    parser.add_argument("--columnar", action="store_true",
+                        help="load the dataset as a packed bit matrix, cached in a sidecar file")
+    parser.add_argument("--sidecar-dir", help="keep --columnar's sidecar here instead of next to the dataset")
+    parser.add_argument("--no-sidecar", action="store_true", help="don't read or write --columnar's sidecar")
+    parser.add_argument("--solver", default="greedy", choices=("greedy", "optimal"))
+    parser.add_argument("--objective", default="expected", choices=("expected", "worst"),
+                        help="what --solver optimal minimizes")
+    args = parser.parse_args(argv)
+
+    guesser = game.ObjectGuesser(args.dataset, tree_cache_dir=args.tree_cache_dir, columnar=args.columnar,
+                                 sidecar=not args.no_sidecar and (args.sidecar_dir or True),
+                                 solver=args.solver, objective=args.objective)
+    server = SessionServer(CompiledTree(guesser), idle_timeout=args.idle_timeout)
+    if args.stdio:
+        asyncio.run(server.serve_stdio())
+    else:
+        asyncio.run(server.serve_socket(args.host, args.port))
+
+if __name__ == "__main__":
+    main()
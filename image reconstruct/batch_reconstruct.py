@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from image_reconstruct import load_images_from_directory, reconstruct_image, save_reconstructed_image
+
+try:
+    import resource
+except ImportError:  # not available on Windows, memory limits are skipped there
+    resource = None
+
+# Reconstructs many strip directories concurrently on one shared process pool.
+#
+#   python batch_reconstruct.py puzzles/* --output-dir out --workers 8 --time-limit 120
+#   python batch_reconstruct.py --manifest jobs.txt --output-dir out --memory-limit 2048
+#
+# Every job gets its own time and memory limit inside the worker. A job that
+# fails, times out or runs out of memory is recorded in the summary and the rest
+# of the batch carries on. If a worker process dies outright, every job it took
+# down is rerun on its own in a single-worker pool, so one crashing job can't
+# take the others with it again.
+
+MAX_ATTEMPTS = 2  # solo runs for a job that was in flight when a worker crashed
+
+
+class JobTimeout(Exception):
+    pass
+
+
+class BatchJob:
+    def __init__(self, name, input_dir, output_path):
+        self.name = name
+        self.input_dir = input_dir
+        self.output_path = output_path
+        self.attempts = 0
+
+
+def read_manifest(manifest_path):
+    """Reads job input directories from a manifest.
+
+    Each non-empty line is either a directory path, or a JSON object with an
+    "input" directory and optionally an "output" path and a "name". Lines starting
+    with # are ignored.
+
+    Returns:
+        list: dicts with "input" and optional "output" and "name" keys.
+    """
+
+    entries = []
+    with open(manifest_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            entries.append(json.loads(line) if line.startswith('{') else {"input": line})
+    return entries
+
+
+def make_jobs(entries, output_dir):
+    """Turns manifest entries (or plain directory strings) into BatchJobs with unique names."""
+    jobs = []
+    used = set()
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"input": entry}
+        base = entry.get("name") or os.path.basename(os.path.normpath(entry["input"])) or "job"
+        name = base
+        suffix = 1
+        while name in used:
+            suffix += 1
+            name = f"{base}_{suffix}"
+        used.add(name)
+        jobs.append(BatchJob(name, entry["input"], entry.get("output") or os.path.join(output_dir, name + ".bmp")))
+    return jobs
+
+
+def _raise_timeout(signum, frame):
+    raise JobTimeout()
+
+
+def _current_address_space():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def _run_job(name, input_dir, output_path, options):
+    """Runs one reconstruction inside a worker process, enforcing its limits.
+
+    Returns:
+        dict: The job's summary (status, timings, error).
+    """
+
+    summary = {"name": name, "input": input_dir, "output": output_path, "status": "ok",
+               "pid": os.getpid(), "stages": {}}
+    time_limit = options.get("time_limit")
+    memory_limit_mb = options.get("memory_limit_mb")
+    old_handler = None
+    old_limits = None
+    start = time.perf_counter()
+
+    try:
+        if time_limit and hasattr(signal, 'SIGALRM'):
+            old_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+            signal.setitimer(signal.ITIMER_REAL, time_limit)
+        if memory_limit_mb and resource is not None:
+            # the limit is on top of what the worker already has mapped (interpreter, numpy, ...)
+            old_limits = resource.getrlimit(resource.RLIMIT_AS)
+            limit = _current_address_space() + memory_limit_mb * 1024 * 1024
+            if old_limits[1] != resource.RLIM_INFINITY:
+                limit = min(limit, old_limits[1])
+            resource.setrlimit(resource.RLIMIT_AS, (limit, old_limits[1]))
+
+        stage_start = time.perf_counter()
+        strips = load_images_from_directory(input_dir, workers=options.get("load_workers"))
+        summary["stages"]["load"] = time.perf_counter() - stage_start
+        summary["strips"] = len(strips)
+        if not strips:
+            raise ValueError("no .bmp strips found")
+
+        stage_start = time.perf_counter()
+        ordered_strips = reconstruct_image(strips, solver=options.get("solver", "greedy"),
+                                           time_budget=options.get("time_budget"))
+        summary["stages"]["matching"] = time.perf_counter() - stage_start
+        summary["placed"] = len(ordered_strips)
+
+        stage_start = time.perf_counter()
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        save_reconstructed_image(ordered_strips, output_path)
+        summary["stages"]["save"] = time.perf_counter() - stage_start
+    except JobTimeout:
+        summary["status"] = "timeout"
+        summary["error"] = f"exceeded the {time_limit}s time limit"
+    except MemoryError:
+        summary["status"] = "memory"
+        summary["error"] = f"exceeded the {memory_limit_mb}MB memory limit"
+    except Exception as e:
+        summary["status"] = "failed"
+        summary["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if old_handler is not None:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, old_handler)
+        if old_limits is not None:
+            resource.setrlimit(resource.RLIMIT_AS, old_limits)
+
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def _failed_summary(job, error):
+    return {"name": job.name, "input": job.input_dir, "status": "failed", "error": error}
+
+
+def _run_alone(job, options):
+    """Reruns a job that was in flight when a worker crashed, in a pool of its own.
+
+    Only crashes while the job runs alone count as its attempts.
+
+    Returns:
+        dict: The job's summary.
+    """
+
+    while job.attempts < MAX_ATTEMPTS:
+        job.attempts += 1
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(_run_job, job.name, job.input_dir, job.output_path, options)
+            try:
+                return future.result()
+            except BrokenProcessPool:
+                continue
+            except Exception as e:
+                return _failed_summary(job, f"{type(e).__name__}: {e}")
+    return _failed_summary(job, "worker process died")
+
+
+def run_batch(inputs, output_dir, workers=None, time_limit=None, memory_limit_mb=None,
+              solver="greedy", time_budget=None, load_workers=None, summary_path=None):
+    """Reconstructs many strip directories concurrently.
+
+    Args:
+        inputs (list): Input directories, or manifest entries as from read_manifest.
+        output_dir (str): Where reconstructed images (and the summary) go.
+        workers (int): Size of the shared process pool, defaults to the CPU count.
+        time_limit (float): Seconds each job may run before it is abandoned.
+        memory_limit_mb (int): Extra address space each job may use.
+        solver (str): reconstruct_image solver for every job.
+        time_budget (float): Time budget for the "optimal" solver.
+        load_workers (int): Threads each job uses to load its strips.
+        summary_path (str): Where to write the JSON summary, defaults to
+            output_dir/summary.json.
+
+    Returns:
+        list: One summary dict per job, in input order.
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = make_jobs(inputs, output_dir)
+    options = {"time_limit": time_limit, "memory_limit_mb": memory_limit_mb, "solver": solver,
+               "time_budget": time_budget, "load_workers": load_workers}
+    summaries = {}
+
+    try:
+        crashed = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_run_job, job.name, job.input_dir, job.output_path, options): job
+                       for job in jobs}
+            try:
+                for future in as_completed(futures):
+                    job = futures[future]
+                    try:
+                        summaries[job.name] = future.result()
+                    except BrokenProcessPool:
+                        crashed.append(job)
+                    except Exception as e:
+                        summaries[job.name] = _failed_summary(job, f"{type(e).__name__}: {e}")
+            except KeyboardInterrupt:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        # one crash takes down every job in flight, so rerun those alone to find out which it was
+        for job in crashed:
+            summaries[job.name] = _run_alone(job, options)
+    except KeyboardInterrupt:
+        pass  # whatever finished is still summarised below
+    finally:
+        results = [summaries.get(job.name, {"name": job.name, "input": job.input_dir, "status": "cancelled"})
+                   for job in jobs]
+        with open(summary_path or os.path.join(output_dir, "summary.json"), "w") as f:
+            json.dump(results, f, indent=2)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconstruct many strip directories concurrently.")
+    parser.add_argument("inputs", nargs="*", help="directories of .bmp strips")
+    parser.add_argument("--manifest", help="file listing input directories (or JSON job lines)")
+    parser.add_argument("--output-dir", default="reconstructed", help="where outputs and summary.json go")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size")
+    parser.add_argument("--time-limit", type=float, default=None, help="seconds per job")
+    parser.add_argument("--memory-limit", type=int, default=None, help="MB of extra memory per job")
+    parser.add_argument("--solver", default="greedy", choices=("greedy", "optimal", "approximate", "exact"))
+    parser.add_argument("--time-budget", type=float, default=None)
+    parser.add_argument("--load-workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    entries = list(args.inputs)
+    if args.manifest:
+        entries += read_manifest(args.manifest)
+    if not entries:
+        parser.error("no input directories given")
+
+    results = run_batch(entries, args.output_dir, args.workers, args.time_limit, args.memory_limit,
+                        args.solver, args.time_budget, args.load_workers)
+    failed = [r for r in results if r["status"] != "ok"]
+    print(f"{len(results) - len(failed)}/{len(results)} jobs succeeded")
+    for r in failed:
+        print(f"  {r['name']}: {r['status']} {r.get('error', '')}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
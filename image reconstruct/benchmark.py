@@ -0,0 +1,244 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from bmp_codec import write_bmp
+from image_reconstruct import (load_images_from_directory, extract_edges, compute_edge_cost_matrix,
+                               order_from_costs, build_edge_index, build_bounded_matcher,
+                               reconstruct_with_indexes, save_reconstructed_image, MAX_DISTANCE_THRESHOLD)
+
+# Synthetic shredder and stage-by-stage benchmark for the strip reconstruction pipeline.
+#
+# Generates an image, cuts it into shuffled strips on disk, then times loading,
+# edge extraction, matching and saving separately and reports throughput, peak
+# traced memory and how much of the original order was recovered, as JSON. Saving
+# streams the strips into the output file, so its time includes decoding them.
+#
+#   python benchmark.py --strips 20 200 2000 --pattern text --output results.json
+
+PATTERNS = ("gradient", "noise", "text")
+MATRIX_LIMIT = 5000  # above this many strips "auto" switches to index-based matching
+
+
+def generate_image(pattern, height, width, seed=0):
+    """Builds a synthetic (height, width, 3) uint8 test image.
+
+    Args:
+        pattern (str): "gradient" (smooth colour ramps), "noise" (smooth random
+            blobs plus pixel noise) or "text" (dark stroked glyphs on lines of paper).
+        height (int): Image height in pixels.
+        width (int): Image width in pixels.
+        seed (int): Random seed.
+    """
+
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+
+    if pattern == "gradient":
+        image = np.stack(np.broadcast_arrays(200 * y + 40 * np.sin(9 * x),
+                                             150 * x + 80 * np.cos(5 * y),
+                                             255 * (0.5 + 0.5 * np.sin(7 * y + 3 * x))), axis=-1)
+    elif pattern == "noise":
+        # bilinear upsampling of a coarse random grid gives smooth blobs
+        coarse = rng.uniform(0, 255, (max(2, height // 32), max(2, width // 32), 3)).astype(np.float32)
+        rows = np.linspace(0, coarse.shape[0] - 1, height)
+        cols = np.linspace(0, coarse.shape[1] - 1, width)
+        r0, c0 = np.floor(rows).astype(int), np.floor(cols).astype(int)
+        r1, c1 = np.minimum(r0 + 1, coarse.shape[0] - 1), np.minimum(c0 + 1, coarse.shape[1] - 1)
+        fr, fc = (rows - r0)[:, None, None], (cols - c0)[None, :, None]
+        top = coarse[r0][:, c0] * (1 - fc) + coarse[r0][:, c1] * fc
+        bottom = coarse[r1][:, c0] * (1 - fc) + coarse[r1][:, c1] * fc
+        image = top * (1 - fr) + bottom * fr
+    elif pattern == "text":
+        image = np.full((height, width, 3), 235, dtype=np.float32)
+        line_height = 12
+        baseline = line_height - 3  # rows below it are for descenders
+        x_height = 4  # first row of short letters, taller ones start at row 0
+        for top in range(4, height - line_height, line_height + 6):
+            left = 4
+            while left < width - 8:
+                # glyphs are built from strokes, so their columns continue down the rows
+                # like real letters instead of being independent pixel noise
+                glyph_width = int(rng.integers(3, 8))
+                glyph = np.zeros((line_height, glyph_width), dtype=bool)
+                first_row = 0 if rng.random() < 0.3 else x_height
+                last_row = line_height if rng.random() < 0.15 else baseline + 1
+                stems = rng.random(glyph_width) < 0.35
+                stems[rng.integers(glyph_width)] = True
+                glyph[first_row:last_row, stems] = True
+                for row in (first_row, (first_row + baseline) // 2, baseline):
+                    if rng.random() < 0.5:
+                        glyph[row] = True  # horizontal bars along the top, middle and baseline
+                image[top:top + line_height, left:left + glyph_width][glyph] = 30
+                left += glyph_width + int(rng.integers(1, 4)) + (6 if rng.random() < 0.15 else 0)
+        image += 25 * y[:, :, None]  # uneven lighting down the page
+    else:
+        raise ValueError(f"unknown pattern {pattern!r}, expected one of {PATTERNS}")
+
+    image = image + rng.normal(0, 2, image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def shred(pixels, strip_height, directory, seed=0):
+    """Cuts an image into horizontal strips and writes them to directory in shuffled order.
+
+    Returns:
+        list: For each file (in sorted filename order) the strip's original position.
+    """
+
+    count = len(pixels) // strip_height
+    order = list(range(count))
+    random.Random(seed).shuffle(order)
+    digits = len(str(count))
+    for k, original in enumerate(order):
+        strip = pixels[original * strip_height:(original + 1) * strip_height]
+        write_bmp(os.path.join(directory, f"strip_{k:0{digits}d}.bmp"), strip)
+    return order
+
+
+def ordering_accuracy(recovered, truth):
+    """Scores a recovered order of file indices against their true positions.
+
+    Returns:
+        dict: exact (whole order right), neighbours (fraction of true adjacent pairs
+            recovered next to each other in the right order), placed (fraction of
+            strips that made it into the output).
+    """
+
+    positions = [truth[i] for i in recovered]
+    adjacent = sum(1 for a, b in zip(positions, positions[1:]) if b == a + 1)
+    return {
+        "exact": positions == sorted(truth),
+        "neighbours": adjacent / max(1, len(truth) - 1),
+        "placed": len(recovered) / max(1, len(truth)),
+    }
+
+
+class StageTimer:
+    """Times named stages and records the peak traced memory of each."""
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    def run(self, name, function, *args, **kwargs):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        stage = {"seconds": elapsed}
+        if self.trace_memory:
+            stage["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        self.stages[name] = stage
+        return result
+
+
+def run_benchmark(n_strips, strip_height=4, width=256, pattern="gradient", solver="auto",
+                  workers=None, edges_only=False, trace_memory=True, seed=0):
+    """Shreds a synthetic image into n_strips strips and times every pipeline stage.
+
+    Args:
+        n_strips (int): Number of strips to cut.
+        strip_height (int): Height of each strip in pixels.
+        width (int): Image width in pixels.
+        pattern (str): Synthetic image pattern, one of PATTERNS.
+        solver (str): A reconstruct_image solver, or "auto" to use "optimal" up to
+            MATRIX_LIMIT strips and "approximate" above it.
+        workers (int): Loader threads, see load_images_from_directory.
+        edges_only (bool): Load edge rows only and decode strips while saving.
+        trace_memory (bool): Record peak memory per stage with tracemalloc (slower).
+        seed (int): Random seed for the image and the shuffle.
+
+    Returns:
+        dict: Parameters, per-stage seconds/peak bytes, throughput and accuracy.
+    """
+
+    if solver == "auto":
+        solver = "optimal" if n_strips <= MATRIX_LIMIT else "approximate"
+
+    pixels = generate_image(pattern, n_strips * strip_height, width, seed)
+    timer = StageTimer(trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            truth = shred(pixels, strip_height, directory, seed)
+            del pixels
+
+            strips = timer.run("load", load_images_from_directory, directory,
+                               workers=workers, edges_only=edges_only)
+
+            if solver in ("greedy", "optimal"):
+                tops, bottoms = timer.run("edges", extract_edges, strips)
+                order = timer.run("matching", lambda: order_from_costs(
+                    compute_edge_cost_matrix(bottoms, tops), solver))
+                ordered_strips = [strips[i] for i in order]
+            else:
+                build = build_edge_index if solver == "approximate" else build_bounded_matcher
+                indexes = timer.run("edges", lambda: (build(strips, "top"), build(strips, "bottom")))
+                ordered_strips = timer.run("matching", reconstruct_with_indexes, strips,
+                                           MAX_DISTANCE_THRESHOLD, *indexes)
+                positions = {id(strip): i for i, strip in enumerate(strips)}
+                order = [positions[id(strip)] for strip in ordered_strips]
+
+            timer.run("save", save_reconstructed_image, ordered_strips,
+                      os.path.join(directory, "reconstructed.bmp"))
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    total = sum(stage["seconds"] for stage in timer.stages.values())
+    megapixels = n_strips * strip_height * width / 1e6
+    for stage in timer.stages.values():
+        stage["strips_per_second"] = n_strips / stage["seconds"] if stage["seconds"] else None
+
+    return {
+        "strips": n_strips,
+        "strip_height": strip_height,
+        "width": width,
+        "pattern": pattern,
+        "solver": solver,
+        "stages": timer.stages,
+        "total_seconds": total,
+        "strips_per_second": n_strips / total if total else None,
+        "megapixels_per_second": megapixels / total if total else None,
+        "accuracy": ordering_accuracy(order, truth),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark strip reconstruction on synthetic shredded images.")
+    parser.add_argument("--strips", type=int, nargs="+", default=[20, 200, 2000],
+                        help="strip counts to benchmark (default: 20 200 2000)")
+    parser.add_argument("--strip-height", type=int, default=4)
+    parser.add_argument("--width", type=int, default=256)
+    parser.add_argument("--pattern", choices=PATTERNS, nargs="+", default=["gradient"])
+    parser.add_argument("--solver", default="auto",
+                        choices=("auto", "greedy", "optimal", "approximate", "exact"))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--edges-only", action="store_true")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (faster, no peak memory)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    results = [run_benchmark(n, args.strip_height, args.width, pattern, args.solver, args.workers,
+                             args.edges_only, not args.no_memory, args.seed)
+               for pattern in args.pattern for n in args.strips]
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import struct
+import numpy as np
+
+# Generated in part by genAI
+# Bulk BMP reading and writing. Pixel data is exposed as (height, width, 3)
+# RGB arrays in top-down row order, which is what Image stores.
+
+FILE_HEADER = struct.Struct('<2sIHHI')  # signature, file size, reserved, reserved, pixel offset
+INFO_HEADER = struct.Struct('<IiiHHIIiiII')  # BITMAPINFOHEADER (40 bytes)
+HEADER_SIZE = FILE_HEADER.size + INFO_HEADER.size  # 54 bytes
+
+DEFAULT_ROWS_PER_BLOCK = 256
+
+
+class BmpHeader:
+    def __init__(self, width, height, bits_per_pixel=24, pixel_offset=HEADER_SIZE, top_down=False):
+        self.width = width
+        self.height = height
+        self.bits_per_pixel = bits_per_pixel
+        self.pixel_offset = pixel_offset
+        self.top_down = top_down
+
+    def get_bytes_per_pixel(self):
+        return self.bits_per_pixel // 8
+
+    def get_row_stride(self):
+        """Bytes per stored row, BMP pads every row to a multiple of 4 bytes."""
+        return (self.width * self.get_bytes_per_pixel() + 3) & ~3
+
+    def get_image_size(self):
+        return self.get_row_stride() * self.height
+
+
+def parse_bmp_header(data):
+    """Parses the file and info headers of a BMP file.
+
+    Args:
+        data (bytes): At least the first 54 bytes of the file.
+
+    Returns:
+        BmpHeader: The parsed header.
+
+    Raises:
+        ValueError: If the data isn't an uncompressed 24 or 32 bit BMP.
+    """
+
+    if len(data) < HEADER_SIZE:
+        raise ValueError("file is too short to be a BMP")
+
+    signature, _, _, _, pixel_offset = FILE_HEADER.unpack_from(data, 0)
+    if signature != b'BM':
+        raise ValueError("missing BM signature")
+
+    (dib_size, width, height, _, bits_per_pixel,
+     compression, _, _, _, _, _) = INFO_HEADER.unpack_from(data, FILE_HEADER.size)
+    if dib_size < INFO_HEADER.size:
+        raise ValueError(f"unsupported DIB header size {dib_size}")
+    if compression != 0 or bits_per_pixel not in (24, 32):
+        raise ValueError(f"only uncompressed 24/32 bit BMPs are supported "
+                         f"(got {bits_per_pixel} bpp, compression {compression})")
+
+    # a negative height means rows are stored top-down
+    return BmpHeader(width, abs(height), bits_per_pixel, pixel_offset, top_down=height < 0)
+
+
+def read_bmp_header(filename):
+    with open(filename, 'rb') as f:
+        return parse_bmp_header(f.read(HEADER_SIZE))
+
+
+def _rows_to_rgb(rows, header):
+    """Turns an (height, stride) byte array into a top-down RGB view without copying."""
+    channels = header.get_bytes_per_pixel()
+    pixels = rows[:, :header.width * channels].reshape(header.height, header.width, channels)
+    pixels = pixels[:, :, 2::-1]  # BGR(A) -> RGB
+    if not header.top_down:
+        pixels = pixels[::-1]  # BMP stores the bottom row first
+    return pixels
+
+
+def map_bmp(filename, writable=False):
+    """Memory-maps a BMP file and returns its pixels as a zero-copy view.
+
+    Args:
+        filename (str): Path to the .bmp file.
+        writable (bool): If True, writes through the view go back to the file,
+            otherwise they stay private to this process (copy-on-write).
+
+    Returns:
+        tuple: (BmpHeader, numpy.ndarray) where the array is a (height, width, 3)
+            RGB view of the mapped pixel data.
+    """
+
+    header = read_bmp_header(filename)
+    rows = np.memmap(filename, dtype=np.uint8, mode='r+' if writable else 'c',
+                     offset=header.pixel_offset, shape=(header.height, header.get_row_stride()))
+    return header, _rows_to_rgb(rows, header)
+
+
+def load_bmp(filename):
+    """Reads a BMP file's pixels into memory with a single bulk read.
+
+    Returns:
+        tuple: (BmpHeader, numpy.ndarray) like map_bmp, but the array owns its memory.
+    """
+
+    with open(filename, 'rb') as f:
+        header = parse_bmp_header(f.read(HEADER_SIZE))
+        f.seek(header.pixel_offset)
+        rows = np.fromfile(f, dtype=np.uint8, count=header.get_image_size())
+    if rows.size != header.get_image_size():
+        raise ValueError(f"{filename} is truncated")
+    rows = rows.reshape(header.height, header.get_row_stride())
+    return header, np.ascontiguousarray(_rows_to_rgb(rows, header))
+
+
+def build_bmp_header(width, height):
+    """Returns the 54 header bytes of a bottom-up 24 bit BMP."""
+    header = BmpHeader(width, height)
+    image_size = header.get_image_size()
+    return (FILE_HEADER.pack(b'BM', HEADER_SIZE + image_size, 0, 0, HEADER_SIZE) +
+            INFO_HEADER.pack(40, width, height, 1, 24, 0, image_size, 2835, 2835, 0, 0))
+
+
+class BmpStreamWriter:
+    """Writes a 24 bit BMP incrementally without holding the whole image.
+
+    The header is written up front. Since BMP stores the bottom row first, the image
+    is fed from the bottom up: each write_rows call takes a (rows, width, 3) RGB block
+    in normal top-down order that sits directly above everything written before it.
+    """
+
+    def __init__(self, filename, width, height, rows_per_block=DEFAULT_ROWS_PER_BLOCK):
+        self.width = width
+        self.height = height
+        self.rows_per_block = rows_per_block
+        self.rows_written = 0
+        self.stride = BmpHeader(width, height).get_row_stride()
+        self.block = np.zeros((max(1, min(rows_per_block, height)), self.stride), dtype=np.uint8)
+        self.file = open(filename, 'wb')
+        self.file.write(build_bmp_header(width, height))
+
+    def write_rows(self, rows):
+        count = len(rows)
+        if rows.shape[1:] != (self.width, 3):
+            raise ValueError(f"rows have shape {rows.shape[1:]}, expected {(self.width, 3)}")
+        if self.rows_written + count > self.height:
+            raise ValueError("more rows written than the image height")
+
+        for end in range(count, 0, -self.rows_per_block):
+            start = max(0, end - self.rows_per_block)
+            out = self.block[:end - start]
+            out[:, :self.width * 3].reshape(end - start, self.width, 3)[...] = rows[start:end][::-1, :, ::-1]
+            self.file.write(out)
+        self.rows_written += count
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        if exc_type is None and self.rows_written != self.height:
+            raise ValueError(f"only {self.rows_written} of {self.height} rows were written")
+
+
+def write_bmp(filename, pixels, rows_per_block=DEFAULT_ROWS_PER_BLOCK):
+    """Writes a (height, width, 3) RGB array as a 24 bit BMP.
+
+    Rows are converted to padded BGR in blocks of rows_per_block, so the file is
+    written with a handful of large writes instead of one per pixel.
+    """
+
+    height, width = pixels.shape[:2]
+    with BmpStreamWriter(filename, width, height, rows_per_block) as writer:
+        writer.write_rows(pixels)
@@ -0,0 +1,107 @@
+import numpy as np
+
+# Exact nearest-edge search that avoids most pixel comparisons.
+#
+# Each edge row is summed over its colour channels and over blocks of columns.
+# By the triangle inequality the L1 distance between two such coarse rows is a
+# lower bound on the full manhattan distance. Candidates are visited cheapest
+# bound first; once a bound exceeds the best distance found, no later candidate
+# can win. Full comparisons are also abandoned as soon as their running sum
+# passes the best distance.
+
+DEFAULT_BLOCK = 16  # columns summed into one coarse value
+DEFAULT_CHUNK = 96  # values compared between early-termination checks
+
+
+def bounded_distance(row1, row2, limit, chunk=DEFAULT_CHUNK):
+    """Manhattan distance that stops once the running sum passes limit.
+
+    Args:
+        row1, row2 (numpy.ndarray): Rows with the same number of values.
+        limit (int): Stop as soon as the partial distance is greater than this.
+        chunk (int): Values compared between checks.
+
+    Returns:
+        tuple: (distance, values_compared). distance is exact if it is <= limit,
+            otherwise it is a partial sum that is already greater than limit.
+    """
+
+    row1 = row1.reshape(-1)
+    row2 = row2.reshape(-1)
+    total = 0
+    for start in range(0, len(row1), chunk):
+        end = start + chunk
+        total += int(np.abs(row1[start:end].astype(np.int32) - row2[start:end]).sum())
+        if total > limit:
+            return total, min(end, len(row1))
+    return total, len(row1)
+
+
+def coarse_edges(edges, block=DEFAULT_BLOCK):
+    """Sums (N, width * 3) edges over channels and column blocks, giving (N, blocks)."""
+    edges = np.asarray(edges).reshape(len(edges), -1, 3)
+    per_column = edges.sum(axis=2, dtype=np.int64)
+    starts = np.arange(0, per_column.shape[1], block)
+    return np.add.reduceat(per_column, starts, axis=1)
+
+
+class BoundedMatcher:
+    """Branch-and-bound exact matcher over one edge of a set of strips.
+
+    Args:
+        edges (numpy.ndarray): (N, width * 3) edge rows.
+        items (list): Objects the rows belong to, same order as edges.
+        block (int): Columns per coarse value, smaller blocks give tighter bounds.
+    """
+
+    def __init__(self, edges, items=None, block=DEFAULT_BLOCK):
+        self.edges = np.asarray(edges).reshape(len(edges), -1)
+        self.items = list(items) if items is not None else list(range(len(edges)))
+        self.positions = {id(item): i for i, item in enumerate(self.items)}
+        self.block = block
+        self.coarse = coarse_edges(self.edges, block)
+        self.alive = np.ones(len(self.edges), dtype=bool)
+        self.values_compared = 0  # edge values touched by full comparisons
+        self.candidates_pruned = 0  # candidates skipped on their bound alone
+
+    def remove(self, item):
+        """Stops an item from being matched again (e.g. once it is placed)."""
+        self.alive[self.positions[id(item)]] = False
+
+    def best_match(self, row, max_distance_threshold):
+        """Finds the remaining edge closest to row, exactly.
+
+        Gives the same answer as comparing every remaining edge in order: the
+        smallest distance under the threshold, earliest position on ties.
+
+        Args:
+            row (numpy.ndarray): The edge to match.
+            max_distance_threshold (int): Edges further away than this are rejected.
+
+        Returns:
+            tuple: (position, distance), position is -1 if nothing is within the threshold.
+        """
+
+        candidates = np.flatnonzero(self.alive)
+        if len(candidates) == 0:
+            return -1, None
+
+        query = np.asarray(row).reshape(1, -1)
+        bounds = np.abs(self.coarse[candidates] - coarse_edges(query, self.block)[0]).sum(axis=1)
+        visit_order = np.argsort(bounds, kind='stable')
+
+        best_position = -1
+        best_distance = max_distance_threshold
+        for visited, k in enumerate(visit_order):
+            if bounds[k] > best_distance:
+                self.candidates_pruned += len(visit_order) - visited
+                break
+            position = candidates[k]
+            distance, compared = bounded_distance(query, self.edges[position], best_distance)
+            self.values_compared += compared
+            if distance < best_distance or (distance == best_distance and
+                                            (best_position < 0 or position < best_position)):
+                best_position = position
+                best_distance = distance
+
+        return best_position, (best_distance if best_position >= 0 else None)
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import threading
+import numpy as np
+from image import LazyImage
+
+# On-disk cache of strip edge rows, so repeated runs over the same strips (e.g.
+# sweeping max_distance_threshold) skip opening and decoding the BMPs.
+#
+# Each strip's top and bottom rows are stored in one small .npy record named after
+# a key of the strip file. The key is either its absolute path, size and
+# modification time (cheap, the default) or a hash of its contents (survives
+# copies and touches, but reads every file). Reading an entry bumps its
+# modification time, and once the cache grows past max_bytes the entries used
+# longest ago are deleted.
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+EVICT_TO = 0.9  # eviction frees down to this fraction of max_bytes, so it doesn't run on every put
+KEY_MODES = ("stat", "content")
+
+
+def _is_entry(name):
+    # .tmp.npy files are puts in progress (or left by a crash), not entries
+    return name.endswith('.npy') and not name.endswith('.tmp.npy')
+
+
+class EdgeCache:
+    """Persistent cache of LazyImage edge rows.
+
+    Args:
+        directory (str): Where the cache files live, created if missing.
+        max_bytes (int): Size cap for all entries together.
+        key (str): "stat" keys strips by path, size and mtime, "content" by a
+            hash of the file's bytes.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, key="stat"):
+        if key not in KEY_MODES:
+            raise ValueError(f"unknown cache key {key!r}, expected one of {KEY_MODES}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.key_mode = key
+        self.lock = threading.Lock()  # loaders may share the cache across threads
+        self.total_bytes = sum(entry.stat().st_size for entry in os.scandir(directory)
+                               if _is_entry(entry.name))
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # locks can't be pickled, worker processes get their own
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def key(self, filename):
+        if self.key_mode == "content":
+            digest = hashlib.sha1()
+            with open(filename, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+            return digest.hexdigest()
+        info = os.stat(filename)
+        text = f"{os.path.abspath(filename)}\0{info.st_size}\0{info.st_mtime_ns}"
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def get(self, filename):
+        """Returns the strip's cached LazyImage, or None if it isn't cached (or is stale)."""
+        path = self._entry_path(self.key(filename))
+        try:
+            entry = np.load(path)[0]
+            top, bottom, height = entry['top'], entry['bottom'], int(entry['height'])
+            os.utime(path)  # mark as recently used
+        except (OSError, IndexError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return LazyImage(filename, len(top), height, top, bottom)
+
+    def put(self, image):
+        """Stores a LazyImage's edges, evicting old entries if the cache is over its cap."""
+        path = self._entry_path(self.key(image.filename))
+        # one record per file, np.load of a plain .npy is much quicker than opening an .npz
+        record = np.empty(1, dtype=[('height', '<i8'), ('top', 'u1', image.top_row.shape),
+                                    ('bottom', 'u1', image.bottom_row.shape)])
+        record['height'], record['top'], record['bottom'] = image.height, image.top_row, image.bottom_row
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+        np.save(temp_path, record)
+        size = os.path.getsize(temp_path)
+        with self.lock:
+            try:
+                replaced = os.path.getsize(path)  # an existing entry for the same key is overwritten
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(temp_path, path)  # readers never see a half-written entry
+            self.total_bytes += size - replaced
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def load(self, filename):
+        """Like LazyImage.read_edges, but served from (and added to) the cache."""
+        image = self.get(filename)
+        if image is None:
+            image = LazyImage.read_edges(filename)
+            self.put(image)
+        return image
+
+    def evict(self):
+        """Deletes least recently used entries until the cache is back under max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if _is_entry(entry.name):
+                info = entry.stat()
+                entries.append((info.st_mtime_ns, info.st_size, entry.path))
+        entries.sort()
+        self.total_bytes = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if self.total_bytes <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.total_bytes -= size
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npy'):
+                os.remove(entry.path)
+        self.total_bytes = 0
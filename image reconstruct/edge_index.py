@@ -0,0 +1,129 @@
+import numpy as np
+
+# Approximate nearest-neighbour search over strip edges, for strip sets too big
+# for the all-pairs cost matrix.
+#
+# Every edge row is shrunk to a signature: the row is split into `bins` groups of
+# columns and each group's R, G and B values are summed. Signatures are
+# clustered with k-means into inverted lists; a query only looks at the members
+# of the few lists whose centroids are closest (an IVF index). The L1 distance
+# between signatures never exceeds the real manhattan distance, so candidates
+# are ranked by a lower bound and the caller refines them with exact distances.
+
+DEFAULT_BINS = 32
+DEFAULT_PROBES = 4
+DEFAULT_CANDIDATES = 20
+KMEANS_ITERATIONS = 10
+
+
+def edge_signatures(edges, bins=DEFAULT_BINS):
+    """Shrinks (N, width * 3) edge rows to (N, bins * 3) per-bin channel sums.
+
+    Args:
+        edges (numpy.ndarray): Flattened edge rows, as from extract_edges.
+        bins (int): Number of column groups, capped at the edge width.
+
+    Returns:
+        numpy.ndarray: float32 signatures whose L1 distance is a lower bound of the
+            manhattan distance between the original rows.
+    """
+
+    edges = np.asarray(edges).reshape(len(edges), -1, 3)
+    bins = min(bins, edges.shape[1])
+    starts = np.linspace(0, edges.shape[1], bins + 1).astype(np.int64)[:-1]
+    sums = np.add.reduceat(edges.astype(np.int64), starts, axis=1)
+    return sums.reshape(len(edges), -1).astype(np.float32)
+
+
+def _kmeans(points, n_clusters, rng):
+    centroids = points[rng.choice(len(points), n_clusters, replace=False)]
+    for _ in range(KMEANS_ITERATIONS):
+        labels = _nearest_centroid(points, centroids)
+        for c in range(n_clusters):
+            members = points[labels == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+    return centroids, _nearest_centroid(points, centroids)
+
+
+def _nearest_centroid(points, centroids, block=4096):
+    labels = np.empty(len(points), dtype=np.int64)
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    for start in range(0, len(points), block):
+        chunk = points[start:start + block]
+        distances = centroid_norms[None, :] - 2 * chunk @ centroids.T
+        labels[start:start + block] = distances.argmin(axis=1)
+    return labels
+
+
+class EdgeIndex:
+    """Inverted-list index over one edge (top or bottom) of a set of strips.
+
+    Args:
+        edges (numpy.ndarray): (N, width * 3) edge rows.
+        items (list): Objects the rows belong to (e.g. the strips), same order as edges.
+        bins (int): Signature resolution, more bins rank candidates more accurately.
+        n_lists (int): Number of k-means clusters, defaults to about sqrt(N).
+        n_probe (int): Clusters searched per query. Higher means better recall, slower queries.
+        k (int): Default number of candidates a query returns.
+        seed (int): Seed for the k-means initialisation.
+    """
+
+    def __init__(self, edges, items=None, bins=DEFAULT_BINS, n_lists=None,
+                 n_probe=DEFAULT_PROBES, k=DEFAULT_CANDIDATES, seed=0):
+        self.items = list(items) if items is not None else list(range(len(edges)))
+        self.positions = {id(item): i for i, item in enumerate(self.items)}
+        self.n_probe = n_probe
+        self.k = k
+        self.bins = bins
+        self.signatures = edge_signatures(edges, bins)
+        self.alive = np.ones(len(edges), dtype=bool)
+
+        n_lists = n_lists or max(1, int(np.sqrt(len(edges))))
+        n_lists = min(n_lists, len(edges))
+        self.centroids, labels = _kmeans(self.signatures, n_lists, np.random.default_rng(seed))
+        order = np.argsort(labels, kind='stable')
+        bounds = np.searchsorted(labels[order], np.arange(n_lists + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(n_lists)]
+
+    def remove(self, item):
+        """Stops an item from being returned by later queries (e.g. once it is placed)."""
+        self.alive[self.positions[id(item)]] = False
+
+    def query(self, edge, k=None, n_probe=None):
+        """Returns up to k candidate positions whose edges are probably closest to edge.
+
+        Lists are probed nearest-centroid first. At least n_probe lists are searched,
+        and more if needed to find k candidates that haven't been removed.
+
+        Args:
+            edge (numpy.ndarray): The query edge row, any shape with width * 3 values.
+            k (int): Number of candidates, defaults to the index's k.
+            n_probe (int): Lists to search, defaults to the index's n_probe.
+
+        Returns:
+            numpy.ndarray: Positions into items, best signature match first.
+        """
+
+        k = k or self.k
+        n_probe = n_probe or self.n_probe
+        signature = edge_signatures(edge.reshape(1, -1), self.bins)[0]
+        list_order = np.argsort(((self.centroids - signature) ** 2).sum(axis=1))
+
+        found = []
+        count = 0
+        for probed, c in enumerate(list_order):
+            if probed >= n_probe and count >= k:
+                break
+            members = self.lists[c][self.alive[self.lists[c]]]
+            found.append(members)
+            count += len(members)
+
+        if not count:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.concatenate(found)
+        distances = np.abs(self.signatures[candidates] - signature).sum(axis=1)
+        if len(candidates) > k:
+            keep = np.argpartition(distances, k - 1)[:k]
+            candidates, distances = candidates[keep], distances[keep]
+        return candidates[np.lexsort((candidates, distances))]
@@ -1,3 +1,8 @@
+import numpy as np
+from bmp_codec import map_bmp, load_bmp, write_bmp
+from png_codec import write_png, DEFAULT_LEVEL, DEFAULT_FILTER
+
+
 class Pixel:
     def __init__(self, r=0, g=0, b=0):
         self.r = r
@@ -15,18 +20,24 @@ class Pixel:
 
 # Generated in part by genAI
 class Image:
-    def __init__(self, width, height):
+    def __init__(self, width, height, pixels=None):
         self.width = width
         self.height = height
-        self.pixels = [[Pixel(0, 0, 0) for _ in range(width)] for _ in range(height)]
+        # One (height, width, 3) uint8 RGB array instead of a Pixel object per pixel
+        if pixels is None:
+            pixels = np.zeros((height, width, 3), dtype=np.uint8)
+        elif pixels.shape != (height, width, 3):
+            raise ValueError(f"pixel array has shape {pixels.shape}, expected {(height, width, 3)}")
+        self.pixels = pixels
 
     def set_pixel(self, r, c, pixel):
         if 0 <= c < self.width and 0 <= r < self.height:
-            self.pixels[r][c] = pixel
+            self.pixels[r, c] = (pixel.r, pixel.g, pixel.b)
 
     def get_pixel(self, r, c):
         if 0 <= c < self.width and 0 <= r < self.height:
-            return self.pixels[r][c]
+            red, green, blue = self.pixels[r, c]
+            return Pixel(int(red), int(green), int(blue))
 
     def get_width(self):
         return self.width
@@ -34,55 +45,83 @@ class Image:
     def get_height(self):
         return self.height
 
+    def get_row(self, r):
+        """Returns row r as a (width, 3) array view, no copy is made."""
+        return self.pixels[r]
+
+    def get_column(self, c):
+        """Returns column c as a (height, 3) array view, no copy is made."""
+        return self.pixels[:, c]
+
+    def get_region(self, r, c, height, width):
+        """Returns the height x width block starting at (r, c) as an array view."""
+        return self.pixels[r:r + height, c:c + width]
+
+    def set_region(self, r, c, values):
+        """Copies a (rows, cols, 3) array into the image starting at (r, c)."""
+        height, width = values.shape[:2]
+        self.pixels[r:r + height, c:c + width] = values
+
     def save_bmp(self, filename):
-        with open(filename, 'wb') as f:
-            # BMP header
-            f.write(b'BM')  # Signature
-            file_size = 54 + self.width * self.height * 3
-            f.write(file_size.to_bytes(4, 'little'))  # File size
-            f.write(b'\x00\x00')  # Reserved
-            f.write(b'\x00\x00')  # Reserved
-            f.write((54).to_bytes(4, 'little'))  # Offset to pixel data
-            
-            # DIB header
-            f.write((40).to_bytes(4, 'little'))  # DIB header size
-            f.write(self.width.to_bytes(4, 'little'))  # Width
-            f.write(self.height.to_bytes(4, 'little'))  # Height
-            f.write(b'\x01\x00')  # Color planes
-            f.write(b'\x18\x00')  # Bits per pixel
-            f.write(b'\x00\x00\x00\x00')  # Compression
-            f.write((self.width * self.height * 3).to_bytes(4, 'little'))  # Image size
-            f.write(b'\x13\x0B\x00\x00')  # X pixels per meter
-            f.write(b'\x13\x0B\x00\x00')  # Y pixels per meter
-            f.write(b'\x00\x00\x00\x00')  # Total colors
-            f.write(b'\x00\x00\x00\x00')  # Important colors
-            
-            # Pixel data (bottom-up)
-            for r in range(self.height - 1, -1, -1):  # BMP format is bottom-up
-                for c in range(self.width):
-                    pixel = self.get_pixel(r, c)
-                    f.write(bytes([pixel.b, pixel.g, pixel.r]))  # Write in BGR format
-
-    def read_bmp(filename):
-        with open(filename, 'rb') as f:
-            # Read BMP header (54 bytes)
-            f.read(18)  # Skip the first 18 bytes to get to width and height
-            width = int.from_bytes(f.read(4), 'little')
-            height = int.from_bytes(f.read(4), 'little')
-            
-            # Skip to pixel array (offset is usually at 54 bytes)
-            f.read(28)  # Skip more header info
-
-            image = Image(width, height)
-
-            # Read pixel data
-            for row in range(height):
-                for col in range(width):
-                    # BMP stores pixels in BGR format, each pixel is 3 bytes
-                    b = ord(f.read(1))
-                    g = ord(f.read(1))
-                    r = ord(f.read(1))
-                    pixel = Pixel(r, g, b)
-                    image.set_pixel(height - 1 - row, col, pixel)  # Flip y-axis
-
-            return image
\ No newline at end of file
+        write_bmp(filename, self.pixels)
+
+    def save_png(self, filename, level=DEFAULT_LEVEL, filter_type=DEFAULT_FILTER):
+        """Writes the image as a compressed PNG, see png_codec for the options."""
+        write_png(filename, self.pixels, level, filter_type)
+
+    @staticmethod
+    def read_bmp(filename, use_mmap=True):
+        # The pixel array is a copy-on-write view of the mapped file, set use_mmap=False
+        # to read it into memory instead (e.g. when holding thousands of files open)
+        if use_mmap:
+            header, pixels = map_bmp(filename)
+        else:
+            header, pixels = load_bmp(filename)
+        return Image(header.width, header.height, pixels)
+
+
+class LazyImage:
+    """Stand-in for an Image when only the top and bottom rows have been read.
+
+    Matching only ever needs those two rows, anything else decodes the full
+    strip from its file on demand (without keeping it around).
+    """
+
+    def __init__(self, filename, width, height, top_row, bottom_row):
+        self.filename = filename
+        self.width = width
+        self.height = height
+        self.top_row = top_row
+        self.bottom_row = bottom_row
+
+    @staticmethod
+    def read_edges(filename):
+        header, pixels = map_bmp(filename)
+        # copy the two rows out so the mapping can be released straight away
+        return LazyImage(filename, header.width, header.height,
+                         np.array(pixels[0]), np.array(pixels[header.height - 1]))
+
+    def load(self):
+        return Image.read_bmp(self.filename)
+
+    def get_width(self):
+        return self.width
+
+    def get_height(self):
+        return self.height
+
+    def get_row(self, r):
+        if r == 0:
+            return self.top_row
+        if r == self.height - 1:
+            return self.bottom_row
+        return self.load().get_row(r)
+
+    def get_pixel(self, r, c):
+        return self.load().get_pixel(r, c)
+
+    def get_column(self, c):
+        return self.load().get_column(c)
+
+    def get_region(self, r, c, height, width):
+        return self.load().get_region(r, c, height, width)
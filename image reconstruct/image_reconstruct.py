@@ -1,20 +1,78 @@
 import os
 import math
-from image import Image
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+import numpy as np
+from image import Image, LazyImage
+from bmp_codec import BmpStreamWriter
+from png_codec import PngStreamWriter, DEFAULT_LEVEL
+from strip_solver import solve_strip_order
+from edge_index import EdgeIndex
+from bound_match import BoundedMatcher, bounded_distance
+from edge_cache import EdgeCache
+import instrumentation
 
-def load_images_from_directory(directory_path):
+MAX_MAPPED_FILES = 256  # beyond this many strips they're read into memory instead of mapped
+SAVE_ROWS_PER_BLOCK = 1024  # rows of a strip read and written at once when saving
+MAX_DISTANCE_THRESHOLD = 20422  # Max threshold is from trial and error, may be a limitation of solution 
+
+@instrumentation.timed("load")
+def load_images_from_directory(directory_path, workers=None, use_processes=False,
+                               max_in_flight=None, edges_only=False, cache=None):
     # revised LLM generated function contracts 
     """Loads and returns a list of .bmp image objects from a directory.
     
     Args:
         directory_path (str): The path to the directory containing .bmp image files.
+        workers (int): Number of threads (or processes) decoding files in parallel.
+            None or 1 loads them one after another.
+        use_processes (bool): Use a process pool instead of a thread pool.
+        max_in_flight (int): Most files submitted but not yet collected at once, which
+            bounds the memory held by finished-but-unordered results. Defaults to 2 * workers.
+        edges_only (bool): Only read the top and bottom rows of each strip, returning
+            LazyImage objects that decode the full strip when it is needed for assembly.
+        cache (EdgeCache): Serve edge rows from (and save them to) this cache, so
+            strips that were seen before aren't opened at all. Implies edges_only.
         
     Returns:
-        list: A list of Image objects loaded from the directory.
+        list: A list of Image (or LazyImage) objects, sorted by filename.
     """
 
-    image_files = [f for f in os.listdir(directory_path) if f.endswith('.bmp')]
-    images = [Image.read_bmp(os.path.join(directory_path, file)) for file in image_files]
+    image_files = sorted(f for f in os.listdir(directory_path) if f.endswith('.bmp'))
+    paths = [os.path.join(directory_path, file) for file in image_files]
+
+    if cache is not None:
+        loader = cache.load
+    elif edges_only:
+        loader = LazyImage.read_edges
+    else:
+        # mapped arrays would just be copied when sent back from a process, and every
+        # mapping holds a file descriptor open, so large directories are read instead
+        loader = partial(Image.read_bmp, use_mmap=not use_processes and len(paths) <= MAX_MAPPED_FILES)
+
+    if not workers or workers <= 1:
+        images = [loader(path) for path in paths]
+    else:
+        max_in_flight = max_in_flight or 2 * workers
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        images = []
+        with executor_class(max_workers=workers) as executor:
+            pending = deque()
+            for path in paths:
+                if len(pending) >= max_in_flight:
+                    images.append(pending.popleft().result())  # collect in submission (filename) order
+                pending.append(executor.submit(loader, path))
+            while pending:
+                images.append(pending.popleft().result())
+
+    if instrumentation.enabled():
+        if cache is not None or edges_only:
+            bytes_read = sum(2 * image.get_width() * 3 for image in images)  # just the two edge rows
+        else:
+            bytes_read = sum(os.path.getsize(path) for path in paths)
+        instrumentation.count("load", files=len(paths), bytes_read=bytes_read)
     return images
 
 def get_top_row(image):
@@ -24,10 +82,10 @@ def get_top_row(image):
         image (Image): The image object.
         
     Returns:
-        list: A list of pixel objects representing the top row of the image.
+        numpy.ndarray: A (width, 3) RGB view of the top row of the image.
     """ 
 
-    return [image.get_pixel(0, c) for c in range(image.get_width())]
+    return image.get_row(0)
 
 def get_bottom_row(image):
     """Extracts the bottom row of pixels from an image.
@@ -36,29 +94,103 @@ def get_bottom_row(image):
         image (Image): The image object.
         
     Returns:
-        list: A list of pixel objects representing the bottom row of the image.
+        numpy.ndarray: A (width, 3) RGB view of the bottom row of the image.
+    """
+
+    return image.get_row(image.get_height() - 1)
+
+def manhattan_distance(row1, row2, limit=None): # Used LLM to explore pixel relation options 
+    # With a limit the comparison stops as soon as the sum passes it, the value
+    # returned is then only known to be greater than limit
+    if limit is not None:
+        distance, compared = bounded_distance(row1, row2, limit)
+        instrumentation.count("manhattan_distance", calls=1, pixels_compared=compared // 3)
+        return distance
+    instrumentation.count("manhattan_distance", calls=1, pixels_compared=row1.size // 3)
+    # widen from uint8 first so the subtraction can't wrap around
+    return int(np.abs(row1.astype(np.int32) - row2).sum())
+
+@instrumentation.timed("index")
+def build_edge_index(strips, side="top", **index_options):
+    """Builds an approximate nearest-neighbour index over one edge of every strip.
+    
+    Args:
+        strips (list): The image strips to index.
+        side (str): "top" to match against top rows, "bottom" for bottom rows.
+        **index_options: Passed to EdgeIndex (bins, n_lists, n_probe, k) to trade
+            recall against speed.
+        
+    Returns:
+        EdgeIndex: Index whose items are the strips.
+    """
+
+    get_row = get_top_row if side == "top" else get_bottom_row
+    edges = np.stack([get_row(strip).reshape(-1) for strip in strips])
+    return EdgeIndex(edges, strips, **index_options)
+
+@instrumentation.timed("index")
+def build_bounded_matcher(strips, side="top", **matcher_options):
+    """Builds an exact branch-and-bound matcher over one edge of every strip.
+    
+    Args:
+        strips (list): The image strips to match against.
+        side (str): "top" to match against top rows, "bottom" for bottom rows.
+        **matcher_options: Passed to BoundedMatcher (block).
+        
+    Returns:
+        BoundedMatcher: Matcher whose items are the strips.
     """
 
-    return [image.get_pixel(image.get_height() - 1, c) for c in range(image.get_width())]
+    get_row = get_top_row if side == "top" else get_bottom_row
+    edges = np.stack([get_row(strip).reshape(-1) for strip in strips]).astype(np.int16)
+    return BoundedMatcher(edges, strips, **matcher_options)
+
+def _best_indexed_match(row, max_distance_threshold, index, get_row):
+    """Refines an index query with exact distances, returns the best position or -1."""
+    if isinstance(index, BoundedMatcher):
+        position, _ = index.best_match(row, max_distance_threshold)
+        return position
 
-def manhattan_distance(row1, row2): # Used LLM to explore pixel relation options 
-    return sum(
-        abs(row1[i].get_r() - row2[i].get_r()) +
-        abs(row1[i].get_g() - row2[i].get_g()) +
-        abs(row1[i].get_b() - row2[i].get_b())
-        for i in range(len(row1))
-    )
+    best_position = -1
+    best_distance = float('inf')
+    for position in index.query(row):
+        distance = manhattan_distance(row, get_row(index.items[position]))
+        if distance < best_distance and distance <= max_distance_threshold:
+            best_position = position
+            best_distance = distance
+    if best_position >= 0:
+        return best_position
 
-def find_best_bottom_match(current_bottom_row, remaining_strips, max_distance_threshold):
+    # Nothing the index suggested is close enough, check every strip still in it
+    for position in np.flatnonzero(index.alive):
+        distance = manhattan_distance(row, get_row(index.items[position]))
+        if distance < best_distance and distance <= max_distance_threshold:
+            best_position = position
+            best_distance = distance
+    return best_position
+
+def find_best_bottom_match(current_bottom_row, remaining_strips, max_distance_threshold, top_index=None):
     """Finds the best matching strip for the current strip based on the bottom row.
     
     Args:
-        current_bottom_row (list): The bottom row of the current strip.
+        current_bottom_row (numpy.ndarray): The bottom row of the current strip.
         remaining_strips (list): The list of remaining image strips.
+        top_index (EdgeIndex): Optional index over the strips' top rows (see
+            build_edge_index). Only its top candidates are compared exactly, so the
+            search is sublinear but approximate. A BoundedMatcher (see
+            build_bounded_matcher) can be passed instead for an exact answer that
+            skips most comparisons. Placed strips must be removed from either, the
+            strips left in the index are searched instead of remaining_strips.
         
     Returns:
-        Image: The best matching strip, or None if no match is found.
+        tuple: (strip, position) of the best match, or (None, -1) if no match is found.
+            The position is into remaining_strips, or into the index's items if one
+            was given.
     """
+    if top_index is not None:
+        position = _best_indexed_match(current_bottom_row, max_distance_threshold, top_index, get_top_row)
+        return (top_index.items[position], position) if position >= 0 else (None, -1)
+
     best_match = None
     best_distance = float('inf') #LLM suggested this use of infinity as a highest number
     best_index = -1
@@ -74,16 +206,22 @@ def find_best_bottom_match(current_bottom_row, remaining_strips, max_distance_th
 
     return best_match, best_index
 
-def find_best_top_match(current_top_row, remaining_strips, max_distance_threshold):
+def find_best_top_match(current_top_row, remaining_strips, max_distance_threshold, bottom_index=None):
     """Finds the best matching strip for the current strip based on the top row.
     
     Args:
-        current_top_row (list): The top row of the current strip.
+        current_top_row (numpy.ndarray): The top row of the current strip.
         remaining_strips (list): The list of remaining image strips.
+        bottom_index (EdgeIndex): Optional index (or BoundedMatcher) over the strips'
+            bottom rows, used the same way as top_index in find_best_bottom_match.
         
     Returns:
-        Image: The best matching strip, or None if no match is found.
+        tuple: (strip, position) of the best match, or (None, -1) if no match is found.
     """
+    if bottom_index is not None:
+        position = _best_indexed_match(current_top_row, max_distance_threshold, bottom_index, get_bottom_row)
+        return (bottom_index.items[position], position) if position >= 0 else (None, -1)
+
     best_match = None
     best_distance = float('inf')
     best_index = -1
@@ -99,54 +237,211 @@ def find_best_top_match(current_top_row, remaining_strips, max_distance_threshol
 
     return best_match, best_index
 
-def reconstruct_image(strips):
-    """Reconstructs the image by placing bottom strips based on their best matches, 
-    then after reaching the max distance threshold adds strips to the top.
+@instrumentation.timed("edges")
+def extract_edges(strips):
+    """Extracts the top and bottom rows of every strip once, for batch matching.
     
     Args:
-        strips (list): A list of image strips to be placed in order.
+        strips (list): A list of image strips, all the same width.
         
     Returns:
-        list: The ordered list of image strips after reconstruction.
+        tuple: (tops, bottoms), two (N, width * 3) int16 arrays of flattened edge rows.
     """
 
-    if not strips:
-        return []
+    tops = np.stack([get_top_row(strip).reshape(-1) for strip in strips]).astype(np.int16)
+    bottoms = np.stack([get_bottom_row(strip).reshape(-1) for strip in strips]).astype(np.int16)
+    instrumentation.count("edges", pixels_read=(tops.size + bottoms.size) // 3)
+    return tops, bottoms
 
-    ordered_strips = [strips[0]]  
-    remaining_strips = strips[1:]
-    max_distance_threshold = 20422  # Max threshold is from trial and error, may be a limitation of solution 
+@instrumentation.timed("cost_matrix")
+def compute_edge_cost_matrix(bottoms, tops, max_block_elements=1 << 24):
+    """Computes the manhattan distance between every bottom edge and every top edge.
+    
+    Args:
+        bottoms (numpy.ndarray): (N, width * 3) bottom edges from extract_edges.
+        tops (numpy.ndarray): (M, width * 3) top edges from extract_edges.
+        max_block_elements (int): Caps the size of the temporary difference array,
+            rows of the result are computed in blocks that fit under it.
+        
+    Returns:
+        numpy.ndarray: (N, M) int64 matrix where [i, j] is the cost of placing strip j
+            directly below strip i.
+    """
+
+    costs = np.empty((len(bottoms), len(tops)), dtype=np.int64)
+    rows_per_block = max(1, max_block_elements // max(1, tops.size))
+    for start in range(0, len(bottoms), rows_per_block):
+        block = bottoms[start:start + rows_per_block]
+        costs[start:start + len(block)] = np.abs(block[:, None, :] - tops[None, :, :]).sum(axis=2)
+    instrumentation.count("cost_matrix", pixels_compared=len(bottoms) * tops.size // 3)
+    return costs
+
+def find_best_match_from_costs(candidate_costs, max_distance_threshold):
+    """Picks the cheapest candidate from a row (or column) of the cost matrix.
+    
+    Args:
+        candidate_costs (numpy.ndarray): Costs of the remaining strips, in remaining order.
+        max_distance_threshold (int): Candidates costing more than this are rejected.
+        
+    Returns:
+        int: Position of the best candidate, or -1 if none is under the threshold.
+    """
+
+    if len(candidate_costs) == 0:
+        return -1
+    best_index = int(np.argmin(candidate_costs))  # first minimum, same tie-break as the loop version
+    if candidate_costs[best_index] > max_distance_threshold:
+        return -1
+    return best_index
+
+@instrumentation.timed("ordering")
+def order_from_costs(costs, solver="greedy", time_budget=None, max_distance_threshold=MAX_DISTANCE_THRESHOLD):
+    """Orders strips using their edge cost matrix.
+    
+    Args:
+        costs (numpy.ndarray): (N, N) matrix from compute_edge_cost_matrix.
+        solver (str): "greedy" or "optimal", as in reconstruct_image.
+        time_budget (float): Time limit for the "optimal" solver.
+        max_distance_threshold (int): Largest edge distance the greedy chaining accepts.
+        
+    Returns:
+        list: Strip indices from top to bottom (greedy may leave some strips out).
+    """
+
+    if solver == "optimal":
+        return solve_strip_order(costs, time_budget)
+
+    ordered = [0]
+    remaining = list(range(1, len(costs)))
 
     # Builds image downward
-    while remaining_strips:
-        current_bottom_row = get_bottom_row(ordered_strips[-1])
-        best_match, best_index = find_best_bottom_match(current_bottom_row, remaining_strips, max_distance_threshold)
+    while remaining:
+        best_index = find_best_match_from_costs(costs[ordered[-1], remaining], max_distance_threshold)
 
-        if best_match:
-            ordered_strips.append(best_match)
-            remaining_strips.pop(best_index)
+        if best_index >= 0:
+            ordered.append(remaining.pop(best_index))
         else:
             break 
     
     #Builds image upward
-    while remaining_strips:
-        current_top_row = get_top_row(ordered_strips[0])
-        best_match, best_index = find_best_top_match(current_top_row, remaining_strips, max_distance_threshold)
+    while remaining:
+        best_index = find_best_match_from_costs(costs[remaining, ordered[0]], max_distance_threshold)
 
-        if best_match:
-            ordered_strips.insert(0, best_match)  # Insert at the beginning
-            remaining_strips.pop(best_index)
+        if best_index >= 0:
+            ordered.insert(0, remaining.pop(best_index))  # Insert at the beginning
         else:
             break 
 
+    return ordered
+
+@instrumentation.timed("ordering")
+def reconstruct_with_indexes(strips, max_distance_threshold, top_index, bottom_index):
+    """Greedy reconstruction like reconstruct_image, matching through edge indexes.
+    
+    Args:
+        strips (list): A list of image strips to be placed in order.
+        max_distance_threshold (int): Largest edge distance that will be accepted.
+        top_index: EdgeIndex or BoundedMatcher over the strips' top rows.
+        bottom_index: EdgeIndex or BoundedMatcher over the strips' bottom rows.
+        
+    Returns:
+        list: The ordered list of image strips after reconstruction.
+    """
+
+    # Placed strips are only dropped from the indexes' alive masks, so no step
+    # searches or shifts a list of the remaining strips
+    def place(strip):
+        top_index.remove(strip)
+        bottom_index.remove(strip)
+
+    below = [strips[0]]
+    above = []  # built upward, so the topmost strip is last
+    remaining = len(strips) - 1
+    place(strips[0])
+
+    # Builds image downward
+    while remaining:
+        best_match, _ = find_best_bottom_match(get_bottom_row(below[-1]), None,
+                                               max_distance_threshold, top_index)
+        if best_match is None:
+            break
+        below.append(best_match)
+        place(best_match)
+        remaining -= 1
+
+    #Builds image upward
+    while remaining:
+        best_match, _ = find_best_top_match(get_top_row(above[-1] if above else below[0]), None,
+                                            max_distance_threshold, bottom_index)
+        if best_match is None:
+            break
+        above.append(best_match)
+        place(best_match)
+        remaining -= 1
+
+    ordered_strips = above[::-1] + below
+    if instrumentation.enabled():
+        # BoundedMatchers count the values they compare, EdgeIndex lookups go through manhattan_distance
+        compared = sum(getattr(index, "values_compared", 0) for index in (top_index, bottom_index))
+        instrumentation.count("ordering", pixels_compared=compared // 3)
     return ordered_strips
 
+@instrumentation.timed("reconstruct", profile=True)
+def reconstruct_image(strips, solver="greedy", time_budget=None,
+                      max_distance_threshold=MAX_DISTANCE_THRESHOLD, index_options=None):
+    """Reconstructs the image by placing bottom strips based on their best matches, 
+    then after reaching the max distance threshold adds strips to the top.
+    
+    Every strip's edges are extracted once and all bottom-to-top distances are computed
+    up front, so each placement is just a lookup into the cost matrix.
+    
+    Args:
+        strips (list): A list of image strips to be placed in order.
+        solver (str): "greedy" chains from the first strip as described above, "optimal"
+            finds a minimum-cost ordering of all strips instead (see strip_solver).
+        time_budget (float): Seconds the "optimal" solver may spend improving large
+            orderings before returning the best one found, None for no limit.
+        max_distance_threshold (int): Largest edge distance the greedy modes will accept.
+        index_options (dict): Options for build_edge_index when solver is "approximate",
+            which runs the greedy chaining with index lookups instead of a cost matrix
+            (for strip sets too large for an N x N matrix). Solver "exact" does the
+            same with branch-and-bound matchers, giving the same result as "greedy";
+            the options then go to build_bounded_matcher.
+        
+    Returns:
+        list: The ordered list of image strips after reconstruction.
+    """
+
+    if solver not in ("greedy", "optimal", "approximate", "exact"):
+        raise ValueError(f"unknown solver {solver!r}")
 
-def save_reconstructed_image(ordered_strips):
+    if not strips:
+        return []
+
+    if solver in ("approximate", "exact"):
+        build = build_edge_index if solver == "approximate" else build_bounded_matcher
+        return reconstruct_with_indexes(strips, max_distance_threshold,
+                                        build(strips, "top", **(index_options or {})),
+                                        build(strips, "bottom", **(index_options or {})))
+
+    tops, bottoms = extract_edges(strips)
+    costs = compute_edge_cost_matrix(bottoms, tops)
+
+    return [strips[i] for i in order_from_costs(costs, solver, time_budget, max_distance_threshold)]
+
+
+@instrumentation.timed("save")
+def save_reconstructed_image(ordered_strips, output_path="reconstructed.bmp", png_level=DEFAULT_LEVEL):
     """Saves the reconstructed image to a file.
     
+    Strips are streamed straight into the output file a block of rows at a time, so
+    only one block is held in memory instead of the whole reconstructed image.
+    
     Args:
         ordered_strips (list): A list of ordered image strips that make up the full image.
+        output_path (str): Where to write the image, a compressed PNG if it ends in
+            .png and an uncompressed .bmp otherwise.
+        png_level (int): zlib compression level (0-9) for PNG output.
         
     Returns:
         None
@@ -154,21 +449,48 @@ def save_reconstructed_image(ordered_strips):
 
     width = ordered_strips[0].get_width()
     height = sum(strip.get_height() for strip in ordered_strips)
-    full_image = Image(width, height)
 
-    current_y = 0
-    for strip in ordered_strips:
-        for y in range(strip.get_height()):
-            for x in range(strip.get_width()):
-                full_image.set_pixel(current_y + y, x, strip.get_pixel(y, x)) #set each pixel to values from list
-        current_y += strip.get_height()
+    if output_path.lower().endswith('.png'):
+        with PngStreamWriter(output_path, width, height, png_level) as writer:
+            for strip in ordered_strips:  # PNG is top-down
+                for start in range(0, strip.get_height(), SAVE_ROWS_PER_BLOCK):
+                    writer.write_rows(strip.get_region(start, 0, SAVE_ROWS_PER_BLOCK, width))
+        instrumentation.count("save", pixels_written=width * height, bytes_written=os.path.getsize(output_path))
+        return
+
+    with BmpStreamWriter(output_path, width, height) as writer:
+        for strip in reversed(ordered_strips):  # BMP is bottom-up, so the last strip goes first
+            # row blocks keep disk-backed strips (TiledImage) from being read in whole
+            for end in range(strip.get_height(), 0, -SAVE_ROWS_PER_BLOCK):
+                start = max(0, end - SAVE_ROWS_PER_BLOCK)
+                writer.write_rows(strip.get_region(start, 0, end - start, width))
+    instrumentation.count("save", pixels_written=width * height, bytes_written=os.path.getsize(output_path))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reassemble shuffled horizontal image strips.")
+    parser.add_argument("directory", nargs="?", default='/home/images',
+                        help="directory of .bmp strips (default: /home/images)")
+    parser.add_argument("--output", default="reconstructed.bmp", help="output .bmp (or .png) path")
+    parser.add_argument("--png-level", type=int, default=DEFAULT_LEVEL, help="zlib level for .png output")
+    parser.add_argument("--solver", default="greedy", choices=("greedy", "optimal", "approximate", "exact"))
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="seconds the optimal solver may spend on large inputs")
+    parser.add_argument("--workers", type=int, default=None, help="threads used to load strips")
+    parser.add_argument("--cache-dir", help="keep strip edges here between runs")
+    parser.add_argument("--report", help="write per-stage timings and counters here (.json or .csv)")
+    parser.add_argument("--profile", action="store_true", help="include a cProfile summary in the report")
+    args = parser.parse_args(argv)
+
+    if args.report:
+        instrumentation.enable(profile=args.profile)
 
-    full_image.save_bmp("reconstructed.bmp")
+    cache = EdgeCache(args.cache_dir) if args.cache_dir else None
+    images = load_images_from_directory(args.directory, workers=args.workers, cache=cache)
+    ordered_strips = reconstruct_image(images, solver=args.solver, time_budget=args.time_budget)
+    save_reconstructed_image(ordered_strips, args.output, args.png_level)
 
-def main():
-    directory_path = '/home/images'
-    images = load_images_from_directory(directory_path)
-    ordered_strips = reconstruct_image(images)
-    save_reconstructed_image(ordered_strips)
+    if args.report:
+        instrumentation.disable().write(args.report)
 
-main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,549 @@
+import csv
+import gc
+import itertools
+import json
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import zlib
+from unittest import mock
+import numpy as np
+from bmp_codec import write_bmp, map_bmp, load_bmp, FILE_HEADER, INFO_HEADER, HEADER_SIZE
+from png_codec import write_png, FILTERS, PNG_SIGNATURE
+from strip_solver import held_karp_order, path_cost
+from image import Image
+from image_reconstruct import reconstruct_image, compute_edge_cost_matrix
+import image_reconstruct
+import instrumentation
+from edge_index import EdgeIndex
+from image import LazyImage
+import incremental
+from edge_cache import EdgeCache
+from tiled_image import TiledImage
+from tile_reconstruct import reconstruct_tiles, save_tile_grid
+from benchmark import generate_image, shred
+import batch_reconstruct
+
+
+def random_pixels(height, width, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def write_raw_bmp(filename, pixels, bits_per_pixel=24, top_down=False):
+    """Writes a BMP by hand, so the reader is checked against more than our own writer."""
+    height, width = pixels.shape[:2]
+    channels = bits_per_pixel // 8
+    stride = (width * channels + 3) & ~3
+    rows = np.zeros((height, stride), dtype=np.uint8)
+    bgr = np.zeros((height, width, channels), dtype=np.uint8)
+    bgr[:, :, :3] = pixels[:, :, ::-1]
+    if channels == 4:
+        bgr[:, :, 3] = 255
+    rows[:, :width * channels] = bgr.reshape(height, -1)
+    if not top_down:
+        rows = rows[::-1]
+    with open(filename, 'wb') as f:
+        f.write(FILE_HEADER.pack(b'BM', HEADER_SIZE + rows.size, 0, 0, HEADER_SIZE))
+        f.write(INFO_HEADER.pack(40, width, -height if top_down else height, 1, bits_per_pixel,
+                                 0, rows.size, 2835, 2835, 0, 0))
+        f.write(rows.tobytes())
+
+_run_job = batch_reconstruct._run_job
+
+
+def crash_on_bad_job(name, input_dir, output_path, options):
+    if name == "bad":
+        os._exit(1)  # takes the whole worker process down, like a segfault would
+    return _run_job(name, input_dir, output_path, options)
+
+
+def read_png(filename):
+    """Minimal PNG decoder for 8-bit RGB files, independent of png_codec"""
+    with open(filename, 'rb') as f:
+        data = f.read()
+    assert data[:8] == PNG_SIGNATURE
+    position, compressed = 8, b''
+    while position < len(data):
+        length, kind = struct.unpack('>I4s', data[position:position + 8])
+        body = data[position + 8:position + 8 + length]
+        crc, = struct.unpack('>I', data[position + 8 + length:position + 12 + length])
+        assert crc == zlib.crc32(body, zlib.crc32(kind))
+        if kind == b'IHDR':
+            width, height, depth, colour_type = struct.unpack('>IIBB', body[:10])
+            assert (depth, colour_type) == (8, 2)
+        elif kind == b'IDAT':
+            compressed += body
+        position += 12 + length
+
+    raw = zlib.decompress(compressed)
+    stride = width * 3
+    previous = [0] * stride
+    rows = []
+    for r in range(height):
+        method = raw[r * (stride + 1)]
+        row = list(raw[r * (stride + 1) + 1:(r + 1) * (stride + 1)])
+        for i in range(stride):
+            left = row[i - 3] if i >= 3 else 0
+            up = previous[i]
+            up_left = previous[i - 3] if i >= 3 else 0
+            if method == 1:
+                row[i] += left
+            elif method == 2:
+                row[i] += up
+            elif method == 3:
+                row[i] += (left + up) // 2
+            elif method == 4:
+                estimate = left + up - up_left
+                distances = abs(estimate - left), abs(estimate - up), abs(estimate - up_left)
+                row[i] += left if distances[0] <= min(distances[1:]) else up if distances[1] <= distances[2] else up_left
+            row[i] &= 0xFF
+        rows.append(row)
+        previous = row
+    return np.array(rows, dtype=np.uint8).reshape(height, width, 3)
+
+
+class TestBmpCodec(unittest.TestCase):
+    """Tests for the bulk BMP reader and writer"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_round_trip_padded_widths(self):
+        """Test that rows needing 0-3 bytes of padding survive a write and read"""
+        for width in (1, 4, 5, 7):
+            pixels = random_pixels(6, width, seed=width)
+            filename = self.path(f"w{width}.bmp")
+            write_bmp(filename, pixels, rows_per_block=4)  # blocks that don't divide the height
+
+            stride = (width * 3 + 3) & ~3
+            self.assertEqual(os.path.getsize(filename), HEADER_SIZE + stride * 6)
+            header, loaded = load_bmp(filename)
+            self.assertEqual((header.width, header.height), (width, 6))
+            np.testing.assert_array_equal(loaded, pixels)
+            _, mapped = map_bmp(filename)
+            np.testing.assert_array_equal(mapped, pixels)
+
+    def test_32_bit_and_top_down(self):
+        """Test reading 32 bpp and top-down (negative height) files"""
+        pixels = random_pixels(5, 7)
+        for bits_per_pixel in (24, 32):
+            for top_down in (False, True):
+                filename = self.path(f"{bits_per_pixel}_{top_down}.bmp")
+                write_raw_bmp(filename, pixels, bits_per_pixel, top_down)
+                header, loaded = load_bmp(filename)
+                self.assertEqual(header.top_down, top_down)
+                np.testing.assert_array_equal(loaded, pixels)
+                _, mapped = map_bmp(filename)
+                np.testing.assert_array_equal(mapped, pixels)
+
+    def test_rejects_truncated_and_compressed(self):
+        """Test that unsupported or damaged files raise ValueError"""
+        filename = self.path("short.bmp")
+        write_bmp(filename, random_pixels(4, 5))
+        with open(filename, 'r+b') as f:
+            f.truncate(HEADER_SIZE + 10)
+        with self.assertRaises(ValueError):
+            load_bmp(filename)
+
+        filename = self.path("compressed.bmp")
+        write_bmp(filename, random_pixels(4, 5))
+        with open(filename, 'r+b') as f:
+            f.seek(FILE_HEADER.size + 16)  # the compression field
+            f.write(struct.pack('<I', 1))
+        with self.assertRaises(ValueError):
+            load_bmp(filename)
+
+
+class TestPngCodec(unittest.TestCase):
+    """Tests for the streaming PNG writer"""
+
+    def test_decodes_to_input(self):
+        """Test that every filter writes a PNG that decodes back to the input"""
+        pixels = random_pixels(9, 7)
+        pixels[:4] = generate_image("gradient", 4, 7)  # smooth rows, where the filters differ
+        with tempfile.TemporaryDirectory() as directory:
+            for filter_type in FILTERS:
+                filename = os.path.join(directory, f"{filter_type}.png")
+                write_png(filename, pixels, filter_type=filter_type, rows_per_block=4)
+                np.testing.assert_array_equal(read_png(filename), pixels, filter_type)
+
+
+class TestStripSolver(unittest.TestCase):
+    """Tests for the strip ordering solvers"""
+
+    def test_held_karp_matches_brute_force(self):
+        """Test that Held-Karp finds a cheapest path on every small input"""
+        rng = np.random.default_rng(4)
+        for n in range(1, 8):
+            for _ in range(5):
+                costs = rng.integers(0, 1000, (n, n))
+                order = held_karp_order(costs)
+                self.assertEqual(sorted(order), list(range(n)))
+                best = min(path_cost(p, costs) for p in itertools.permutations(range(n)))
+                self.assertEqual(path_cost(order, costs), best)
+
+
+class TestReconstructImage(unittest.TestCase):
+    """Tests for reconstruct_image"""
+
+    def shuffled_strips(self, pattern, count, strip_height=4, width=24, seed=0):
+        pixels = generate_image(pattern, count * strip_height, width, seed)
+        strips = [Image(width, strip_height, pixels[k * strip_height:(k + 1) * strip_height].copy())
+                  for k in range(count)]
+        order = np.random.default_rng(seed).permutation(count)
+        return [strips[k] for k in order]
+
+    def test_exact_matches_greedy(self):
+        """Test that branch-and-bound matching places strips exactly as the cost matrix does"""
+        for pattern in ("gradient", "noise", "text"):
+            for threshold in (20422, 2000, 200):  # low ones leave strips unplaced
+                strips = self.shuffled_strips(pattern, 30, seed=len(pattern))
+                greedy = reconstruct_image(strips, solver="greedy", max_distance_threshold=threshold)
+                exact = reconstruct_image(strips, solver="exact", max_distance_threshold=threshold)
+                self.assertEqual([id(s) for s in exact], [id(s) for s in greedy], (pattern, threshold))
+
+    def test_approximate_places_each_strip_once(self):
+        """Test that index-based matching uses every strip at most once and all of them when it can"""
+        for pattern in ("gradient", "noise", "text"):
+            for threshold in (20422, 200):
+                strips = self.shuffled_strips(pattern, 30, seed=len(pattern))
+                ordered = reconstruct_image(strips, solver="approximate", max_distance_threshold=threshold)
+                self.assertEqual(len({id(s) for s in ordered}), len(ordered), (pattern, threshold))
+                if threshold == 20422:
+                    self.assertEqual(len(ordered), len(strips), pattern)
+
+    def test_edge_index_recall(self):
+        """Test that an index query nearly always contains the brute-force nearest edge"""
+        for pattern in ("gradient", "noise", "text"):
+            rows = generate_image(pattern, 800, 64, seed=1).astype(np.int64).reshape(800, -1)
+            tops, bottoms = rows[0::2], rows[1::2]
+            index = EdgeIndex(tops)
+            hits = 0
+            for bottom in bottoms:
+                distances = np.abs(tops - bottom).sum(axis=1)
+                hits += distances[index.query(bottom)].min() == distances.min()
+            self.assertGreaterEqual(hits / len(bottoms), 0.95, pattern)
+
+
+class TestBatchReconstruct(unittest.TestCase):
+    """Tests for run_batch"""
+
+    def test_crashing_job_spares_the_rest(self):
+        """Test that a job that kills its worker fails alone while the others finish"""
+        with tempfile.TemporaryDirectory() as directory:
+            entries = []
+            for name in ("a", "bad", "b", "c"):
+                input_dir = os.path.join(directory, name)
+                os.makedirs(input_dir)
+                shred(generate_image("gradient", 16, 8), 4, input_dir)
+                entries.append({"input": input_dir, "name": name})
+
+            with mock.patch.object(batch_reconstruct, "_run_job", crash_on_bad_job):
+                results = batch_reconstruct.run_batch(entries, os.path.join(directory, "out"), workers=2)
+
+            statuses = {r["name"]: r["status"] for r in results}
+            self.assertEqual(statuses, {"a": "ok", "bad": "failed", "b": "ok", "c": "ok"})
+            self.assertEqual(results[1]["error"], "worker process died")
+            self.assertTrue(os.path.exists(os.path.join(directory, "out", "a.bmp")))
+
+
+
+class TestIncremental(unittest.TestCase):
+    """Tests for incremental reconstruction of a growing strip directory"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.directory.name, "source")
+        self.watched = os.path.join(self.directory.name, "watched")
+        self.state_path = os.path.join(self.directory.name, "state.npz")
+        os.makedirs(self.source)
+        os.makedirs(self.watched)
+        self.truth = shred(generate_image("gradient", 40 * 4, 16), 4, self.source)
+        self.files = sorted(os.listdir(self.source))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def copy(self, files):
+        for name in files:
+            shutil.copy(os.path.join(self.source, name), self.watched)
+
+    def assertMatchesFullBuild(self, state):
+        """Checks the state's costs against a fresh matrix and that its order recovers the image"""
+        slots = state.slots()
+        self.assertEqual(sorted(state.files[i] for i in slots), sorted(os.listdir(self.watched)))
+        edges = [LazyImage.read_edges(os.path.join(self.watched, state.files[i])) for i in slots]
+        tops = np.stack([edge.get_row(0).reshape(-1) for edge in edges]).astype(np.int16)
+        bottoms = np.stack([edge.get_row(edge.get_height() - 1).reshape(-1) for edge in edges]).astype(np.int16)
+        np.testing.assert_array_equal(state.costs[np.ix_(slots, slots)], compute_edge_cost_matrix(bottoms, tops))
+
+        positions = [self.truth[self.files.index(state.files[i])] for i in state.order]
+        self.assertEqual(sorted(state.order), slots)
+        self.assertEqual(positions, sorted(positions))
+
+    def test_insert_matches_full_build(self):
+        """Test that strips added to a saved state end up as a full rebuild would place them"""
+        self.copy(self.files[:25])
+        state, added, removed = incremental.run_incremental(self.watched, self.state_path)
+        self.assertEqual((added, removed), (25, 0))
+        self.copy(self.files[25:])
+        state, added, removed = incremental.run_incremental(self.watched, self.state_path)
+        self.assertEqual((added, removed), (15, 0))
+        self.assertMatchesFullBuild(state)
+        self.assertMatchesFullBuild(incremental.IncrementalState.load(self.state_path))
+
+        full = incremental.IncrementalState()
+        incremental.update_state(full, self.watched)
+        self.assertEqual([state.files[i] for i in state.order], [full.files[i] for i in full.order])
+
+    def test_remove_and_reuse_slots(self):
+        """Test that removed strips leave slots that new strips fill without rewriting the matrix"""
+        self.copy(self.files)
+        state = incremental.load_state(self.state_path)
+        incremental.refresh(state, self.watched, self.state_path)
+        costs_file = incremental.buffer_paths(self.state_path)["costs"]
+        inode = os.stat(costs_file).st_ino
+
+        gone = self.files[3:30:4]
+        for name in gone:
+            os.remove(os.path.join(self.watched, name))
+        self.assertEqual(incremental.refresh(state, self.watched, self.state_path), (0, len(gone)))
+        self.assertEqual(len(state), 40 - len(gone))
+        self.assertMatchesFullBuild(state)
+
+        self.copy(gone)
+        self.assertEqual(incremental.refresh(state, self.watched, self.state_path), (len(gone), 0))
+        self.assertEqual(len(state.files), 40)  # the emptied slots were reused
+        self.assertEqual(os.stat(costs_file).st_ino, inode)  # updated in place, not rewritten
+        self.assertMatchesFullBuild(state)
+        self.assertMatchesFullBuild(incremental.load_state(self.state_path))
+
+
+
+class TestTileReconstruct(unittest.TestCase):
+    """Tests for reassembling images cut into a grid of tiles"""
+
+    def cut(self, pattern, rows, cols, size=8, seed=0):
+        """Returns the image and its shuffled tiles, with each tile's original grid position"""
+        pixels = generate_image(pattern, rows * size, cols * size, seed)
+        tiles = [Image(size, size, pixels[r * size:(r + 1) * size, c * size:(c + 1) * size].copy())
+                 for r in range(rows) for c in range(cols)]
+        order = np.random.default_rng(seed).permutation(len(tiles))
+        positions = {id(tiles[i]): divmod(int(i), cols) for i in order}
+        return pixels, [tiles[i] for i in order], positions
+
+    def assertLayout(self, grid, positions, rows, cols, missing=()):
+        self.assertEqual((len(grid), len(grid[0])), (rows, cols))
+        for r, row in enumerate(grid):
+            for c, tile in enumerate(row):
+                if (r, c) in missing:
+                    self.assertIsNone(tile)
+                else:
+                    self.assertEqual(positions[id(tile)], (r, c))
+
+    def test_full_grid(self):
+        """Test that shuffled tiles go back where they were cut from, with or without the grid size"""
+        for pattern in ("gradient", "noise"):
+            pixels, tiles, positions = self.cut(pattern, 6, 8, seed=len(pattern))
+            self.assertLayout(reconstruct_tiles(tiles, 6, 8), positions, 6, 8)
+            grid = reconstruct_tiles(tiles)
+            self.assertLayout(grid, positions, 6, 8)
+
+            with tempfile.TemporaryDirectory() as directory:
+                filename = os.path.join(directory, "tiles.bmp")
+                save_tile_grid(grid, filename)
+                np.testing.assert_array_equal(load_bmp(filename)[1], pixels)
+
+    def test_missing_tiles(self):
+        """Test that the tiles of an incomplete grid keep their places around the holes"""
+        _, tiles, positions = self.cut("noise", 6, 8)
+        missing = {(0, 3), (2, 2), (5, 7)}
+        tiles = [tile for tile in tiles if positions[id(tile)] not in missing]
+        self.assertLayout(reconstruct_tiles(tiles, 6, 8), positions, 6, 8, missing)
+
+
+
+class TestEdgeCache(unittest.TestCase):
+    """Tests for the on-disk edge row cache"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.directory.name, "cache")
+        self.strips = []
+        for k in range(5):
+            filename = os.path.join(self.directory.name, f"strip_{k}.bmp")
+            write_bmp(filename, random_pixels(6, 5, seed=k))
+            self.strips.append(filename)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assertSameEdges(self, image, filename):
+        expected = LazyImage.read_edges(filename)
+        self.assertEqual(image.height, expected.height)
+        np.testing.assert_array_equal(image.top_row, expected.top_row)
+        np.testing.assert_array_equal(image.bottom_row, expected.bottom_row)
+
+    def test_hits(self):
+        """Test that a second load is served from the cache, also by a new cache object"""
+        cache = EdgeCache(self.cache_dir)
+        for _ in range(2):
+            for filename in self.strips:
+                self.assertSameEdges(cache.load(filename), filename)
+        self.assertEqual((cache.hits, cache.misses), (5, 5))
+
+        reopened = EdgeCache(self.cache_dir)
+        self.assertEqual(reopened.total_bytes, cache.total_bytes)
+        self.assertIsNotNone(reopened.get(self.strips[0]))
+
+    def test_content_key(self):
+        """Test that content keys survive copies but not changed pixels"""
+        cache = EdgeCache(self.cache_dir, key="content")
+        cache.load(self.strips[0])
+        copy = os.path.join(self.directory.name, "copy.bmp")
+        shutil.copy(self.strips[0], copy)
+        self.assertSameEdges(cache.get(copy), self.strips[0])
+
+        write_bmp(copy, random_pixels(6, 5, seed=99))
+        self.assertIsNone(cache.get(copy))
+        self.assertSameEdges(cache.load(copy), copy)
+
+    def test_eviction(self):
+        """Test that the least recently used entries go once the cache is over its cap"""
+        cache = EdgeCache(self.cache_dir)
+        cache.load(self.strips[0])
+        entry_size = cache.total_bytes
+        cache = EdgeCache(self.cache_dir, max_bytes=3 * entry_size)
+        cache.put(cache.get(self.strips[0]))  # replacing an entry doesn't count it twice
+        self.assertEqual(cache.total_bytes, entry_size)
+
+        for k, filename in enumerate(self.strips):
+            cache.load(filename)
+            entry = cache._entry_path(cache.key(filename))
+            os.utime(entry, ns=(k * 10 ** 9, k * 10 ** 9))  # distinct use times, oldest first
+        self.assertLessEqual(cache.total_bytes, 3 * entry_size)
+        self.assertEqual(cache.total_bytes, sum(entry.stat().st_size for entry in os.scandir(self.cache_dir)))
+        self.assertIsNone(cache.get(self.strips[0]))
+        self.assertIsNotNone(cache.get(self.strips[-1]))
+
+    def test_ignores_leftover_temp_files(self):
+        """Test that files from interrupted puts don't count toward the cache size"""
+        os.makedirs(self.cache_dir)
+        with open(os.path.join(self.cache_dir, "abc.123.tmp.npy"), 'wb') as f:
+            f.write(b"\0" * 1000)
+        self.assertEqual(EdgeCache(self.cache_dir).total_bytes, 0)
+
+
+
+class TestTiledImage(unittest.TestCase):
+    """Tests for the disk-backed image"""
+
+    def test_regions_across_evicted_blocks(self):
+        """Test that writes survive their block being evicted and mapped again"""
+        expected = random_pixels(18, 7)
+        with TiledImage(7, 18, block_rows=4, max_cached_blocks=2) as image:
+            for r, c, height, width in ((0, 0, 18, 3), (0, 3, 5, 4), (5, 3, 13, 4)):  # regions spanning blocks
+                image.set_region(r, c, expected[r:r + height, c:c + width])
+            self.assertLessEqual(len(image.cache), 2)
+            self.assertNotIn(0, image.cache)  # evicted by the later writes
+
+            np.testing.assert_array_equal(image.get_region(0, 0, 18, 7), expected)
+            np.testing.assert_array_equal(image.get_region(3, 2, 6, 4), expected[3:9, 2:6])
+            np.testing.assert_array_equal(image.get_column(5), expected[:, 5])
+            np.testing.assert_array_equal(image.get_row(17), expected[17])
+            pixel = image.get_pixel(9, 1)
+            self.assertEqual((pixel.r, pixel.g, pixel.b), tuple(int(v) for v in expected[9, 1]))
+            self.assertLessEqual(len(image.cache), 2)
+
+            with tempfile.TemporaryDirectory() as directory:
+                filename = os.path.join(directory, "tiled.bmp")
+                image.save_bmp(filename)
+                np.testing.assert_array_equal(load_bmp(filename)[1], expected)
+                copy = TiledImage.from_bmp(filename, block_rows=5, max_cached_blocks=1)
+                np.testing.assert_array_equal(copy.get_region(0, 0, 18, 7), expected)
+                copy.close()
+
+    def test_temporary_file_removed(self):
+        """Test that a temporary backing file goes with close() or garbage collection, a named one stays"""
+        image = TiledImage(4, 4)
+        filename = image.filename
+        image.get_region(0, 0, 4, 4)
+        del image
+        gc.collect()
+        self.assertFalse(os.path.exists(filename))
+
+        image = TiledImage(4, 4)
+        image.close()
+        image.close()
+        self.assertFalse(os.path.exists(image.filename))
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "pixels.rgb")
+            with TiledImage(4, 4, filename) as image:
+                image.set_region(0, 0, random_pixels(4, 4))
+            del image
+            gc.collect()
+            with TiledImage(4, 4, filename) as reopened:
+                np.testing.assert_array_equal(reopened.get_region(0, 0, 4, 4), random_pixels(4, 4))
+            self.assertTrue(os.path.exists(filename))
+
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Tests for the --report stage timings and counters"""
+
+    def test_reports_from_a_reconstruction(self):
+        """Test that a small run's JSON and CSV reports name each stage with the expected counts"""
+        strips, width, strip_height = 8, 8, 4
+        with tempfile.TemporaryDirectory() as directory:
+            input_dir = os.path.join(directory, "strips")
+            os.makedirs(input_dir)
+            shred(generate_image("gradient", strips * strip_height, width), strip_height, input_dir)
+            bytes_read = sum(os.path.getsize(os.path.join(input_dir, f)) for f in os.listdir(input_dir))
+            output = os.path.join(directory, "out.bmp")
+
+            reports = {}
+            for extension in ("json", "csv"):
+                reports[extension] = os.path.join(directory, "report." + extension)
+                image_reconstruct.main([input_dir, "--output", output, "--profile",
+                                        "--report", reports[extension]])
+                self.assertFalse(instrumentation.enabled())
+
+            expected = {  # stages are listed as they first finish, so reconstruct after its parts
+                "load": {"calls": 1, "files": strips, "bytes_read": bytes_read},
+                "edges": {"calls": 1, "pixels_read": 2 * strips * width},
+                "cost_matrix": {"calls": 1, "pixels_compared": strips * strips * width},
+                "ordering": {"calls": 1},
+                "reconstruct": {"calls": 1},
+                "save": {"calls": 1, "pixels_written": strips * strip_height * width,
+                         "bytes_written": os.path.getsize(output)},
+            }
+
+            with open(reports["json"]) as f:
+                report = json.load(f)
+            self.assertEqual(list(report["stages"]), list(expected))
+            for name, counters in expected.items():
+                stage = report["stages"][name]
+                self.assertEqual({counter: stage[counter] for counter in counters}, counters, name)
+                self.assertGreaterEqual(stage["seconds"], 0)
+            self.assertGreaterEqual(report["total_seconds"], report["stages"]["reconstruct"]["seconds"])
+            self.assertTrue(report["profile"])
+
+            with open(reports["csv"], newline='') as f:
+                rows = {row["stage"]: row for row in csv.DictReader(f)}
+            self.assertEqual(list(rows), list(expected))
+            for name, counters in expected.items():
+                self.assertEqual({counter: int(rows[name][counter]) for counter in counters}, counters, name)
+                self.assertEqual(rows[name]["files"], str(strips) if name == "load" else "0")
+
+
+if __name__ == '__main__':
+    unittest.main()
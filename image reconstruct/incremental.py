@@ -0,0 +1,407 @@
+import argparse
+import os
+import time
+import numpy as np
+from image import LazyImage
+from image_reconstruct import compute_edge_cost_matrix, save_reconstructed_image
+from strip_solver import solve_strip_order
+
+# Incremental strip reconstruction for directories that keep receiving strips.
+#
+# The edges of every strip seen so far, the full cost matrix and the current
+# ordering are kept on disk next to the state file, and in memory between polls
+# with --watch. An update only reads the edge rows of new (or changed) files,
+# computes their costs against everything else and inserts them where they add
+# the least cost, so adding k strips to N costs O(k * N) instead of rebuilding
+# the N x N matrix.
+#
+# The edge rows and the cost matrix are memory-mapped .npy files, so an update
+# also only writes the k new rows and columns. Removed strips leave an empty
+# slot that a later strip reuses, instead of renumbering (and rewriting)
+# everything after them.
+#
+#   python incremental.py strips/ --state strips.npz --output reconstructed.bmp
+#   python incremental.py strips/ --state strips.npz --watch --interval 5
+
+COST_DTYPE = np.int32  # edge costs are at most width * 3 * 255, half the memory of int64
+MIN_CAPACITY = 64  # slots the buffers start with once the first strips arrive
+BUFFERS = ("tops", "bottoms", "costs")
+
+
+def buffer_paths(state_path):
+    """Returns {buffer name: .npy path} for the memory-mapped arrays of a state file."""
+    return {name: f"{state_path}.{name}.npy" for name in BUFFERS}
+
+
+class IncrementalState:
+    """Edges, costs and ordering of the strips seen so far.
+
+    Strips live in slots: slot i's edges are row i of tops/bottoms, costs[i, j]
+    is the cost of placing slot j directly below slot i, as in
+    compute_edge_cost_matrix, and files[i] is None while the slot is empty.
+    order lists slots from top to bottom.
+
+    tops, bottoms and costs are views into buffers with room to spare, which
+    double in size when they fill up. Once the state has been saved the buffers
+    are memory-mapped from files next to it, so changes to them go straight to
+    disk and save() only writes the small per-strip arrays.
+    """
+
+    def __init__(self, width=None):
+        self.width = width
+        self.files = []  # slot -> file name relative to the watched directory, None if empty
+        self.stats = np.empty((0, 2), dtype=np.int64)  # (size, mtime_ns) when the edges were read
+        self.heights = np.empty(0, dtype=np.int64)
+        self.order = []
+        self.path = None  # state file the buffers are mapped next to, None while only in memory
+        self._tops = None
+        self._bottoms = None
+        self._costs = np.empty((0, 0), dtype=COST_DTYPE)
+        self._free = []  # empty slots a new strip may take
+        self._freed = []  # emptied since the last save, which may still list their old strips
+
+    def __len__(self):
+        return len(self.files) - len(self._free) - len(self._freed)
+
+    def slots(self):
+        """Returns the occupied slots in ascending order."""
+        return [i for i, name in enumerate(self.files) if name is not None]
+
+    @property
+    def tops(self):
+        return None if self._tops is None else self._tops[:len(self.files)]
+
+    @property
+    def bottoms(self):
+        return None if self._bottoms is None else self._bottoms[:len(self.files)]
+
+    @property
+    def costs(self):
+        return self._costs[:len(self.files), :len(self.files)]
+
+    def save(self, path):
+        """Writes the state to path, mapping the buffers next to it on the first save there.
+
+        Buffer files are only ever grown (into a new file swapped in whole) or
+        written in slots the last saved state doesn't use, and the state file is
+        swapped in last, so a crash never leaves a state that points at edges
+        or costs that aren't there.
+        """
+        if path != self.path:
+            self._map_buffers(path)
+        for name in BUFFERS:
+            buffer = getattr(self, "_" + name)
+            if isinstance(buffer, np.memmap):
+                buffer.flush()
+
+        # write next to the target and swap it in, so a crash never leaves half a state file
+        temp_path = path + ".tmp.npz"
+        np.savez(temp_path, width=self.width or 0, stats=self.stats, heights=self.heights,
+                 files=np.array([name or '' for name in self.files], dtype=str),
+                 order=np.array(self.order, dtype=np.int64))
+        os.replace(temp_path, path)
+        self._free += self._freed
+        self._freed = []
+
+    @staticmethod
+    def load(path):
+        with np.load(path, allow_pickle=False) as data:
+            state = IncrementalState(int(data["width"]) or None)
+            state.files = [str(name) or None for name in data["files"]]
+            state.stats = data["stats"]
+            state.heights = data["heights"]
+            state.order = [int(i) for i in data["order"]]
+            if "costs" in data.files:
+                # written before the buffers moved to files of their own, mapped on the next save
+                if state.files:
+                    state._tops, state._bottoms = data["tops"], data["bottoms"]
+                state._costs = data["costs"].astype(COST_DTYPE)
+                return state
+
+        state.path = path
+        for name, buffer_path in buffer_paths(path).items():
+            if os.path.exists(buffer_path):
+                setattr(state, "_" + name, np.load(buffer_path, mmap_mode='r+'))
+        state._free = [i for i, name in enumerate(state.files) if name is None]
+        return state
+
+    def _new_buffer(self, name, shape, dtype, path):
+        """Returns an uninitialised buffer, as a memory-mapped file swapped in at path if given"""
+        if path is None:
+            return np.empty(shape, dtype=dtype)
+        final_path = buffer_paths(path)[name]
+        temp_path = final_path + ".tmp.npy"
+        buffer = np.lib.format.open_memmap(temp_path, mode='w+', dtype=dtype, shape=shape)
+        os.replace(temp_path, final_path)  # the mapping follows the file
+        return buffer
+
+    def _replace_buffers(self, capacity, edge_length, path):
+        n = len(self.files)
+        costs = self._new_buffer("costs", (capacity, capacity), COST_DTYPE, path)
+        costs[:n, :n] = self.costs
+        tops = self._new_buffer("tops", (capacity, edge_length), np.int16, path)
+        bottoms = self._new_buffer("bottoms", (capacity, edge_length), np.int16, path)
+        if n:
+            tops[:n] = self.tops
+            bottoms[:n] = self.bottoms
+        self._costs, self._tops, self._bottoms = costs, tops, bottoms
+
+    def _map_buffers(self, path):
+        """Moves the buffers into memory-mapped files next to path"""
+        self.path = path
+        if self._tops is not None:
+            self._replace_buffers(len(self._costs), self._tops.shape[1], path)
+
+    def _reserve(self, count, edge_length):
+        """Makes room for count slots, at least doubling the buffers when they grow"""
+        if count <= len(self._costs):
+            return
+        self._replace_buffers(max(count, 2 * len(self._costs), MIN_CAPACITY), edge_length, self.path)
+
+    def remove(self, slots):
+        """Drops strips (e.g. deleted files), leaving their slots empty."""
+        for i in slots:
+            self.files[i] = None
+        # a saved state may still point at these slots, so only reuse them after the next save
+        (self._freed if self.path is not None else self._free).extend(slots)
+        self.order = [i for i in self.order if self.files[i] is not None]
+
+    def add(self, names, stats, strips):
+        """Puts strips into free slots and fills in their rows and columns of the cost matrix only.
+
+        Args:
+            names (list): File names of the new strips.
+            stats (list): (size, mtime_ns) of each file.
+            strips (list): LazyImage (or Image) objects with the strips' edges.
+
+        Returns:
+            list: Slots the new strips were given.
+
+        Raises:
+            ValueError: If a strip's width differs from the others, or is too wide
+                for its edge costs to fit the cost matrix.
+        """
+
+        if not strips:
+            return []
+        if self.width is None:
+            self.width = strips[0].get_width()
+        for name, strip in zip(names, strips):
+            if strip.get_width() != self.width:
+                raise ValueError(f"{name} is {strip.get_width()} pixels wide, expected {self.width}")
+        if self.width * 3 * 255 * 2 > np.iinfo(COST_DTYPE).max:  # insertion_cost adds two edges
+            raise ValueError(f"strips {self.width} pixels wide are too wide for {np.dtype(COST_DTYPE).name} costs")
+
+        new_tops = np.stack([strip.get_row(0).reshape(-1) for strip in strips]).astype(np.int16)
+        new_bottoms = np.stack([strip.get_row(strip.get_height() - 1).reshape(-1)
+                                for strip in strips]).astype(np.int16)
+
+        reused = self._free[:len(strips)]
+        del self._free[:len(strips)]
+        first_new = len(self.files)
+        appended = len(strips) - len(reused)
+        self._reserve(first_new + appended, new_tops.shape[1])
+        self.files.extend([None] * appended)
+        self.stats = np.concatenate([self.stats, np.zeros((appended, 2), dtype=np.int64)])
+        self.heights = np.concatenate([self.heights, np.zeros(appended, dtype=np.int64)])
+
+        slots = reused + list(range(first_new, first_new + appended))
+        old = np.array(self.slots(), dtype=np.intp)
+        new = np.array(slots, dtype=np.intp)
+        self._tops[new] = new_tops
+        self._bottoms[new] = new_bottoms
+        for slot, name in zip(slots, names):
+            self.files[slot] = name
+        self.stats[new] = np.array(stats, dtype=np.int64).reshape(-1, 2)
+        self.heights[new] = [strip.get_height() for strip in strips]
+
+        everything = np.array(self.slots(), dtype=np.intp)
+        # new strips above anything, then old strips above new ones
+        self._costs[np.ix_(new, everything)] = compute_edge_cost_matrix(new_bottoms, self._tops[everything])
+        self._costs[np.ix_(old, new)] = compute_edge_cost_matrix(self._bottoms[old], new_tops)
+        return slots
+
+
+def insertion_cost(order, costs, strip):
+    """Cost added by inserting strip at each position of order.
+
+    Returns:
+        numpy.ndarray: len(order) + 1 costs, entry k for inserting before order[k]
+            (the last entry appends it at the bottom).
+    """
+
+    if not order:
+        return np.zeros(1, dtype=np.int64)
+    order = np.asarray(order)
+    above = np.concatenate([[0], costs[order, strip]])  # nothing above position 0
+    below = np.concatenate([costs[strip, order], [0]])  # nothing below the last position
+    broken = np.concatenate([[0], costs[order[:-1], order[1:]], [0]])  # links the strip splits
+    return above + below - broken
+
+
+def insert_strips(order, costs, strips):
+    """Inserts strips into order one at a time, each where it adds the least cost.
+
+    Every strip is then taken out and reinserted once more, which repairs
+    placements made before its neighbours had arrived.
+
+    Returns:
+        list: The repaired order.
+    """
+
+    order = list(order)
+    for strip in strips:
+        order.insert(int(np.argmin(insertion_cost(order, costs, strip))), strip)
+    for strip in strips:
+        order.remove(strip)
+        order.insert(int(np.argmin(insertion_cost(order, costs, strip))), strip)
+    return order
+
+
+def scan_directory(directory_path):
+    """Returns {file name: (size, mtime_ns)} for the .bmp files in a directory."""
+    files = {}
+    for entry in os.scandir(directory_path):
+        if entry.name.endswith('.bmp') and entry.is_file():
+            info = entry.stat()
+            files[entry.name] = (info.st_size, info.st_mtime_ns)
+    return files
+
+
+def update_state(state, directory_path, time_budget=None):
+    """Brings a state up to date with the strips currently in a directory.
+
+    New files are read (edge rows only) and inserted into the ordering, deleted
+    files are dropped, and files whose size or modification time changed are
+    treated as deleted and re-added. A state with no strips yet is ordered from
+    scratch with solve_strip_order.
+
+    Args:
+        state (IncrementalState): Updated in place.
+        directory_path (str): Directory of .bmp strips.
+        time_budget (float): Time budget for solve_strip_order on the first build.
+
+    Returns:
+        tuple: (added, removed), the numbers of strips inserted and dropped.
+    """
+
+    current = scan_directory(directory_path)
+    stale = [i for i, name in enumerate(state.files) if name is not None
+             and (name not in current or tuple(state.stats[i]) != current[name])]
+    state.remove(stale)
+
+    known = set(state.files)
+    names = sorted(name for name in current if name not in known)
+    strips = [LazyImage.read_edges(os.path.join(directory_path, name)) for name in names]
+    first_build = len(state) == 0
+    added = state.add(names, [current[name] for name in names], strips)
+
+    if first_build:
+        slots = state.slots()
+        order = solve_strip_order(state.costs[np.ix_(slots, slots)], time_budget) if slots else []
+        state.order = [slots[i] for i in order]
+    else:
+        state.order = insert_strips(state.order, state.costs, added)
+    return len(added), len(stale)
+
+
+def ordered_strips(state, directory_path):
+    """Returns the state's ordering as LazyImages, decoded from disk only when saved."""
+    return [LazyImage(os.path.join(directory_path, state.files[i]), state.width, int(state.heights[i]),
+                      state.tops[i].astype(np.uint8).reshape(-1, 3),
+                      state.bottoms[i].astype(np.uint8).reshape(-1, 3))
+            for i in state.order]
+
+
+def load_state(state_path):
+    """Loads a state file, or starts an empty state if there isn't one yet."""
+    return IncrementalState.load(state_path) if os.path.exists(state_path) else IncrementalState()
+
+
+def refresh(state, directory_path, state_path, output_path=None, time_budget=None):
+    """Updates a state from the directory and saves the state and image if anything changed.
+
+    Args:
+        state (IncrementalState): Updated in place.
+        directory_path (str): Directory of .bmp strips.
+        state_path (str): State file, written when the state changed or doesn't exist yet.
+        output_path (str): Where to write the reconstructed image when anything
+            changed (or no image exists there yet), None to skip saving it.
+        time_budget (float): Time budget for the first full ordering.
+
+    Returns:
+        tuple: (added, removed).
+    """
+
+    added, removed = update_state(state, directory_path, time_budget)
+    if added or removed or not os.path.exists(state_path):
+        state.save(state_path)
+    if output_path and len(state) and (added or removed or not os.path.exists(output_path)):
+        save_reconstructed_image(ordered_strips(state, directory_path), output_path)
+    return added, removed
+
+
+def run_incremental(directory_path, state_path, output_path=None, time_budget=None):
+    """Loads (or starts) a state, updates it from the directory and saves it again.
+
+    Args:
+        directory_path (str): Directory of .bmp strips.
+        state_path (str): State file, created if it doesn't exist.
+        output_path (str): Where to write the reconstructed image when anything
+            changed (or no image exists there yet), None to skip saving it.
+        time_budget (float): Time budget for the first full ordering.
+
+    Returns:
+        tuple: (state, added, removed).
+    """
+
+    state = load_state(state_path)
+    added, removed = refresh(state, directory_path, state_path, output_path, time_budget)
+    return state, added, removed
+
+
+def watch(directory_path, state_path, output_path=None, interval=2.0, time_budget=None, max_polls=None):
+    """Polls a directory and updates the reconstruction whenever strips arrive or leave.
+
+    The state is loaded once and kept in memory, the file is only written back
+    when a poll changes something.
+
+    Args:
+        interval (float): Seconds between directory scans.
+        max_polls (int): Stop after this many scans, None to run until interrupted.
+    """
+
+    state = load_state(state_path)
+    polls = 0
+    try:
+        while max_polls is None or polls < max_polls:
+            added, removed = refresh(state, directory_path, state_path, output_path, time_budget)
+            if added or removed:
+                print(f"{len(state)} strips (+{added} -{removed})")
+            polls += 1
+            if max_polls is None or polls < max_polls:
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally reassemble a growing directory of strips.")
+    parser.add_argument("directory", help="directory of .bmp strips")
+    parser.add_argument("--state", required=True, help="state file (.npz) kept between runs")
+    parser.add_argument("--output", default="reconstructed.bmp", help="output .bmp path")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="seconds the first full ordering may spend on large inputs")
+    parser.add_argument("--watch", action="store_true", help="keep polling the directory for new strips")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between polls with --watch")
+    args = parser.parse_args(argv)
+
+    if args.watch:
+        watch(args.directory, args.state, args.output, args.interval, args.time_budget)
+    else:
+        state, added, removed = run_incremental(args.directory, args.state, args.output, args.time_budget)
+        print(f"{len(state)} strips (+{added} -{removed})")
+
+
+if __name__ == "__main__":
+    main()
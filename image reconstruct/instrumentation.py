@@ -0,0 +1,166 @@
+import cProfile
+import csv
+import functools
+import io
+import json
+import pstats
+import time
+from contextlib import contextmanager, nullcontext
+
+# Opt-in stage timing and counters for the reconstruction pipeline.
+#
+#   recorder = instrumentation.enable(profile=True)
+#   ... load, reconstruct, save ...
+#   instrumentation.disable()
+#   recorder.write("report.json")  # or report.csv
+#
+# Pipeline functions are wrapped with timed() and call count() unconditionally.
+# While no recorder is enabled both come down to one global check, so leaving
+# them in costs next to nothing.
+
+PROFILE_ENTRIES = 30  # functions listed in a report's profile section
+
+_recorder = None
+_NULL_STAGE = nullcontext()
+
+
+class Recorder:
+    """Collects wall time, call counts and counters per named stage.
+
+    Args:
+        profile (bool): Also run cProfile around profiled() blocks (slows them down).
+    """
+
+    def __init__(self, profile=False):
+        self.profile = profile
+        self.stages = {}
+        self.profiler = None
+        self.profiling = False
+        self.started = time.perf_counter()
+
+    def _stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {"seconds": 0.0, "calls": 0}
+        return stage
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage = self._stage(name)
+            stage["seconds"] += time.perf_counter() - start
+            stage["calls"] += 1
+
+    def count(self, name, **counters):
+        stage = self._stage(name)
+        for counter, value in counters.items():
+            stage[counter] = stage.get(counter, 0) + value
+
+    @contextmanager
+    def profiled(self):
+        if not self.profile or self.profiling:  # nested blocks are covered by the outer one
+            yield
+            return
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()  # one profiler, so repeated blocks add up
+        self.profiling = True
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+            self.profiling = False
+
+    def profile_entries(self, limit=PROFILE_ENTRIES):
+        """Returns the functions with the most cumulative time, as dicts."""
+        if self.profiler is None:
+            return []
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        entries = []
+        for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+            entries.append({"function": f"{filename}:{line}({function})", "calls": calls,
+                            "own_seconds": own, "cumulative_seconds": cumulative})
+        entries.sort(key=lambda entry: entry["cumulative_seconds"], reverse=True)
+        return entries[:limit]
+
+    def report(self):
+        """Returns everything recorded as a JSON-serialisable dict."""
+        return {
+            "total_seconds": time.perf_counter() - self.started,
+            "stages": self.stages,
+            "profile": self.profile_entries(),
+        }
+
+    def write(self, path):
+        """Writes the report as CSV (one row per stage) if path ends in .csv, JSON otherwise."""
+        if path.lower().endswith('.csv'):
+            columns = ["stage", "seconds", "calls"]
+            for stage in self.stages.values():
+                columns += [counter for counter in stage if counter not in columns]
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=columns, restval=0)
+                writer.writeheader()
+                for name, stage in self.stages.items():
+                    writer.writerow({"stage": name, **stage})
+        else:
+            with open(path, 'w') as f:
+                json.dump(self.report(), f, indent=2)
+
+
+def enable(profile=False):
+    """Starts recording into a fresh Recorder and returns it."""
+    global _recorder
+    _recorder = Recorder(profile)
+    return _recorder
+
+
+def disable():
+    """Stops recording, returning the Recorder that was active (or None)."""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+def enabled():
+    return _recorder is not None
+
+
+def stage(name):
+    """Context manager timing a block as one call of the named stage."""
+    if _recorder is None:
+        return _NULL_STAGE
+    return _recorder.stage(name)
+
+
+def count(name, **counters):
+    """Adds to the named stage's counters, e.g. count("save", bytes_written=n)."""
+    if _recorder is not None:
+        _recorder.count(name, **counters)
+
+
+def timed(name, profile=False):
+    """Decorator recording every call of a function as the named stage.
+
+    Args:
+        profile (bool): Also run the function under profiled().
+    """
+
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return function(*args, **kwargs)
+            with _recorder.stage(name), (_recorder.profiled() if profile else _NULL_STAGE):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def profiled():
+    """Context manager running cProfile around a block, if the recorder asked for it."""
+    if _recorder is None:
+        return _NULL_STAGE
+    return _recorder.profiled()
@@ -0,0 +1,163 @@
+import struct
+import zlib
+import numpy as np
+
+# Streaming PNG writer for (height, width, 3) uint8 RGB arrays.
+#
+# PNG stores rows top-down, each prefixed with a filter type byte. Rows are
+# filtered a block at a time with numpy, pushed through one zlib compressor and
+# written out as IDAT chunks of about chunk_size bytes, so neither the raw nor
+# the compressed image is ever held in memory at once.
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+FILTERS = ("none", "sub", "up", "average", "paeth", "adaptive")
+DEFAULT_LEVEL = 6  # zlib level, 1 is fastest, 9 smallest
+DEFAULT_FILTER = "adaptive"
+DEFAULT_CHUNK_SIZE = 1 << 18  # bytes of compressed data per IDAT chunk
+DEFAULT_ROWS_PER_BLOCK = 256
+BYTES_PER_PIXEL = 3
+
+
+def _chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(data, zlib.crc32(kind)))
+
+
+def _paeth(left, up, up_left):
+    # the spec's predictor, on int16 arrays so the differences can't wrap
+    estimate = left + up - up_left
+    distance_left = np.abs(estimate - left)
+    distance_up = np.abs(estimate - up)
+    distance_up_left = np.abs(estimate - up_left)
+    return np.where((distance_left <= distance_up) & (distance_left <= distance_up_left), left,
+                    np.where(distance_up <= distance_up_left, up, up_left))
+
+
+def filter_rows(rows, previous, method=DEFAULT_FILTER):
+    """Applies PNG filtering to a block of rows.
+
+    Args:
+        rows (numpy.ndarray): (n, width * 3) uint8 raw rows.
+        previous (numpy.ndarray): The raw row just above the block, zeros for the
+            first row of the image.
+        method (str): One of FILTERS. "adaptive" picks, per row, the filter whose
+            output has the smallest sum of absolute (signed) bytes, the usual
+            heuristic for what deflate compresses best.
+
+    Returns:
+        numpy.ndarray: (n, 1 + width * 3) uint8 rows, each led by its filter type.
+    """
+
+    if method not in FILTERS:
+        raise ValueError(f"unknown PNG filter {method!r}, expected one of {FILTERS}")
+
+    current = rows.astype(np.int16)
+    up = np.vstack([previous.reshape(1, -1).astype(np.int16), current[:-1]])
+    left = np.zeros_like(current)
+    left[:, BYTES_PER_PIXEL:] = current[:, :-BYTES_PER_PIXEL]
+    up_left = np.zeros_like(current)
+    up_left[:, BYTES_PER_PIXEL:] = up[:, :-BYTES_PER_PIXEL]
+
+    predictors = {
+        "none": lambda: 0,
+        "sub": lambda: left,
+        "up": lambda: up,
+        "average": lambda: (left + up) >> 1,
+        "paeth": lambda: _paeth(left, up, up_left),
+    }
+
+    out = np.empty((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+    if method != "adaptive":
+        out[:, 0] = FILTERS.index(method)
+        out[:, 1:] = (current - predictors[method]()) & 0xFF
+        return out
+
+    best_score = None
+    for filter_type, name in enumerate(FILTERS[:-1]):
+        filtered = ((current - predictors[name]()) & 0xFF).astype(np.uint8)
+        score = np.abs(filtered.view(np.int8).astype(np.int32)).sum(axis=1)
+        better = np.ones(len(rows), dtype=bool) if best_score is None else score < best_score
+        out[better, 0] = filter_type
+        out[better, 1:] = filtered[better]
+        best_score = score if best_score is None else np.minimum(score, best_score)
+    return out
+
+
+class PngStreamWriter:
+    """Writes an 8 bit RGB PNG incrementally without holding the whole image.
+
+    Rows are fed top-down: each write_rows call takes a (rows, width, 3) RGB block
+    that sits directly below everything written before it.
+
+    Args:
+        filename (str): Output path.
+        width (int): Image width in pixels.
+        height (int): Image height in pixels.
+        level (int): zlib compression level, 0-9.
+        filter_type (str): Row filter, one of FILTERS.
+        chunk_size (int): Compressed bytes collected before an IDAT chunk is written.
+    """
+
+    def __init__(self, filename, width, height, level=DEFAULT_LEVEL, filter_type=DEFAULT_FILTER,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        if filter_type not in FILTERS:
+            raise ValueError(f"unknown PNG filter {filter_type!r}, expected one of {FILTERS}")
+        self.width = width
+        self.height = height
+        self.filter_type = filter_type
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+        self.previous = np.zeros(width * BYTES_PER_PIXEL, dtype=np.uint8)
+        self.compressor = zlib.compressobj(level)
+        self.pending = []  # compressed pieces not yet written as a chunk
+        self.pending_size = 0
+        self.file = open(filename, 'wb')
+        self.file.write(PNG_SIGNATURE)
+        # 8 bits per channel, colour type 2 (RGB), deflate, adaptive filtering, no interlace
+        self.file.write(_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+
+    def _emit(self, data, force=False):
+        if data:
+            self.pending.append(data)
+            self.pending_size += len(data)
+        if self.pending_size >= self.chunk_size or (force and self.pending_size):
+            self.file.write(_chunk(b'IDAT', b''.join(self.pending)))
+            self.pending = []
+            self.pending_size = 0
+
+    def write_rows(self, rows):
+        count = len(rows)
+        if rows.shape[1:] != (self.width, 3):
+            raise ValueError(f"rows have shape {rows.shape[1:]}, expected {(self.width, 3)}")
+        if self.rows_written + count > self.height:
+            raise ValueError("more rows written than the image height")
+        if count == 0:
+            return
+
+        raw = np.ascontiguousarray(rows).reshape(count, -1)
+        self._emit(self.compressor.compress(filter_rows(raw, self.previous, self.filter_type)))
+        self.previous = raw[-1].copy()
+        self.rows_written += count
+
+    def close(self):
+        if self.file.closed:
+            return
+        self._emit(self.compressor.flush(), force=True)
+        self.file.write(_chunk(b'IEND', b''))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        if exc_type is None and self.rows_written != self.height:
+            raise ValueError(f"only {self.rows_written} of {self.height} rows were written")
+
+
+def write_png(filename, pixels, level=DEFAULT_LEVEL, filter_type=DEFAULT_FILTER,
+              rows_per_block=DEFAULT_ROWS_PER_BLOCK):
+    """Writes a (height, width, 3) RGB array as a PNG, filtering rows_per_block rows at a time."""
+    height, width = pixels.shape[:2]
+    with PngStreamWriter(filename, width, height, level, filter_type) as writer:
+        for start in range(0, height, rows_per_block):
+            writer.write_rows(pixels[start:start + rows_per_block])
@@ -0,0 +1,260 @@
+import time
+import numpy as np
+
+# Orders strips as a minimum-cost Hamiltonian path over the edge cost matrix
+# (costs[i, j] = cost of putting strip j directly below strip i).
+# Small inputs are solved exactly with Held-Karp, larger ones with greedy-edge
+# construction followed by 2-opt / Or-opt local search.
+
+EXACT_LIMIT = 20  # Held-Karp needs 2^n * n table entries, 20 strips is ~100MB
+CANDIDATES_PER_STRIP = 10  # greedy-edge only looks at each strip's cheapest successors
+MAX_SEGMENT_MOVE = 3  # longest segment Or-opt tries to relocate
+
+
+def path_cost(order, costs):
+    """Returns the total cost of visiting the strips in order."""
+    order = np.asarray(order)
+    return int(costs[order[:-1], order[1:]].sum())
+
+
+def held_karp_order(costs):
+    """Finds the exact minimum-cost path through every strip.
+
+    Runs the Held-Karp DP one subset size at a time, with all subsets of a size
+    and all predecessors handled in batched array operations.
+
+    Args:
+        costs (numpy.ndarray): (n, n) edge cost matrix.
+
+    Returns:
+        list: Strip indices in the optimal order.
+    """
+
+    n = len(costs)
+    if n <= 1:
+        return list(range(n))
+
+    dtype = np.int32 if int(costs.max()) * n < np.iinfo(np.int32).max // 2 else np.int64
+    unreachable = np.iinfo(dtype).max // 2
+    weights = costs.astype(dtype)
+
+    # dp[mask, j] = cheapest path visiting exactly the strips in mask and ending at j
+    dp = np.full((1 << n, n), unreachable, dtype=dtype)
+    parent = np.full((1 << n, n), -1, dtype=np.int8)
+    for i in range(n):
+        dp[1 << i, i] = 0
+
+    masks = np.arange(1 << n, dtype=np.int64)
+    sizes = np.zeros(1 << n, dtype=np.int8)
+    for bit in range(n):
+        sizes += ((masks >> bit) & 1).astype(np.int8)
+
+    for size in range(1, n):
+        layer = masks[sizes == size]
+        for j in range(n):
+            sources = layer[((layer >> j) & 1) == 0]
+            candidates = dp[sources] + weights[:, j]  # every predecessor i in one go
+            best_prev = candidates.argmin(axis=1)
+            targets = sources | (1 << j)
+            dp[targets, j] = candidates[np.arange(len(sources)), best_prev]
+            parent[targets, j] = best_prev
+
+    mask = (1 << n) - 1
+    last = int(dp[mask].argmin())
+    order = []
+    while last >= 0:
+        order.append(last)
+        prev = int(parent[mask, last])
+        mask ^= 1 << last
+        last = prev
+    return order[::-1]
+
+
+def _find(groups, i):
+    while groups[i] != i:
+        groups[i] = groups[groups[i]]
+        i = groups[i]
+    return i
+
+
+def _link_edges(edges, successor, predecessor, groups):
+    """Greedily adds edges (i, j) that keep the graph a set of disjoint paths."""
+    for i, j in edges:
+        if successor[i] >= 0 or predecessor[j] >= 0:
+            continue
+        root_i, root_j = _find(groups, i), _find(groups, j)
+        if root_i == root_j:  # would close a cycle
+            continue
+        successor[i] = j
+        predecessor[j] = i
+        groups[root_j] = root_i
+
+
+def greedy_edge_order(costs, candidates_per_strip=CANDIDATES_PER_STRIP):
+    """Builds a path by repeatedly taking the cheapest edge that keeps it a path.
+
+    Only each strip's cheapest candidates_per_strip successors are sorted, which
+    links almost everything. The leftover path fragments are then joined by running
+    the same procedure on the (much smaller) fragment-to-fragment cost matrix.
+
+    Args:
+        costs (numpy.ndarray): (n, n) edge cost matrix.
+        candidates_per_strip (int): Successors considered per strip in the first pass.
+
+    Returns:
+        list: Strip indices in path order.
+    """
+
+    n = len(costs)
+    if n <= 1:
+        return list(range(n))
+
+    k = min(candidates_per_strip, n - 1)
+    masked = costs.astype(np.float64)
+    np.fill_diagonal(masked, np.inf)
+    nearest = np.argpartition(masked, k - 1, axis=1)[:, :k] if k < n - 1 else np.argsort(masked, axis=1)[:, :k]
+    sources = np.repeat(np.arange(n), k)
+    targets = nearest.reshape(-1)
+    edge_order = np.argsort(masked[sources, targets], kind='stable')
+
+    successor = [-1] * n
+    predecessor = [-1] * n
+    groups = list(range(n))
+    _link_edges(zip(sources[edge_order].tolist(), targets[edge_order].tolist()),
+                successor, predecessor, groups)
+
+    fragments = []
+    for start in range(n):
+        if predecessor[start] < 0:
+            fragment = [start]
+            while successor[fragment[-1]] >= 0:
+                fragment.append(successor[fragment[-1]])
+            fragments.append(fragment)
+
+    if len(fragments) == 1:
+        return fragments[0]
+
+    # Join fragments: cost of fragment a followed by fragment b is tail(a) -> head(b)
+    heads = [fragment[0] for fragment in fragments]
+    tails = [fragment[-1] for fragment in fragments]
+    fragment_costs = costs[np.ix_(tails, heads)]
+    order = []
+    for f in greedy_edge_order(fragment_costs, candidates_per_strip=len(fragments)):
+        order.extend(fragments[f])
+    return order
+
+
+def _edge_costs(order, costs):
+    forward = costs[order[:-1], order[1:]]
+    backward = costs[order[1:], order[:-1]]
+    return (np.concatenate(([0], np.cumsum(forward))),
+            np.concatenate(([0], np.cumsum(backward))))
+
+
+def _best_two_opt(order, costs, a, forward_sums, backward_sums):
+    """Best reversal of order[a..b] over all b > a, as (delta, b)."""
+    n = len(order)
+    b = np.arange(a + 1, n)
+    # edges inside the segment flip direction
+    delta = (backward_sums[b] - backward_sums[a]) - (forward_sums[b] - forward_sums[a])
+    if a > 0:
+        delta = delta + costs[order[a - 1], order[b]] - costs[order[a - 1], order[a]]
+    inner = b < n - 1
+    after = order[np.minimum(b + 1, n - 1)]
+    delta = delta + np.where(inner, costs[order[a], after] - costs[order[b], after], 0)
+    best = int(delta.argmin())
+    return int(delta[best]), int(b[best])
+
+
+def _best_or_opt(order, costs, a, length):
+    """Best relocation of the segment order[a:a+length], as (delta, new order)."""
+    n = len(order)
+    segment = order[a:a + length]
+    rest = np.concatenate((order[:a], order[a + length:]))
+    first, last = segment[0], segment[-1]
+
+    removed = 0
+    if a > 0:
+        removed += costs[order[a - 1], first]
+    if a + length < n:
+        removed += costs[last, order[a + length]]
+    if 0 < a and a + length < n:
+        removed -= costs[order[a - 1], order[a + length]]
+
+    # gaps in rest: position p puts the segment before rest[p] (p = len(rest) appends)
+    insert = np.empty(len(rest) + 1, dtype=np.int64)
+    insert[0] = costs[last, rest[0]]
+    insert[-1] = costs[rest[-1], first]
+    insert[1:-1] = costs[rest[:-1], first] + costs[last, rest[1:]] - costs[rest[:-1], rest[1:]]
+    insert[a] = removed  # putting it back where it was is not a move
+
+    p = int(insert.argmin())
+    delta = int(insert[p] - removed)
+    if delta >= 0:
+        return 0, None
+    return delta, np.concatenate((rest[:p], segment, rest[p:]))
+
+
+def improve_order(order, costs, deadline=None):
+    """Runs 2-opt and Or-opt moves until no move helps or the deadline passes.
+
+    Costs are asymmetric, so a 2-opt reversal is priced with prefix sums of the
+    forward and backward edge costs along the current path.
+
+    Args:
+        order (list): Starting strip order.
+        costs (numpy.ndarray): (n, n) edge cost matrix.
+        deadline (float): time.monotonic() value to stop at, or None to run to a local optimum.
+
+    Returns:
+        list: The improved order.
+    """
+
+    order = np.asarray(order, dtype=np.int64)
+    n = len(order)
+    if n < 3:
+        return order.tolist()
+
+    improved = True
+    while improved:
+        improved = False
+        forward_sums, backward_sums = _edge_costs(order, costs)
+        for a in range(n - 1):
+            if deadline is not None and time.monotonic() >= deadline:
+                return order.tolist()
+
+            delta, b = _best_two_opt(order, costs, a, forward_sums, backward_sums)
+            if delta < 0:
+                order[a:b + 1] = order[a:b + 1][::-1]
+                forward_sums, backward_sums = _edge_costs(order, costs)
+                improved = True
+
+            for length in range(1, min(MAX_SEGMENT_MOVE, n - 1) + 1):
+                if a + length > n:
+                    break
+                delta, moved = _best_or_opt(order, costs, a, length)
+                if moved is not None:
+                    order = moved
+                    forward_sums, backward_sums = _edge_costs(order, costs)
+                    improved = True
+    return order.tolist()
+
+
+def solve_strip_order(costs, time_budget=None, exact_limit=EXACT_LIMIT):
+    """Finds a low-cost ordering of all strips.
+
+    Args:
+        costs (numpy.ndarray): (n, n) edge cost matrix.
+        time_budget (float): Seconds to spend on local search, None for no limit.
+            When it runs out the best ordering found so far is returned.
+        exact_limit (int): Largest strip count solved exactly with Held-Karp.
+
+    Returns:
+        list: Strip indices in order from top to bottom.
+    """
+
+    if len(costs) <= exact_limit:
+        return held_karp_order(costs)
+
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    return improve_order(greedy_edge_order(costs), costs, deadline)
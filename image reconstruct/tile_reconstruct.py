@@ -0,0 +1,302 @@
+import heapq
+import numpy as np
+from bmp_codec import BmpStreamWriter
+from edge_index import EdgeIndex
+from image_reconstruct import load_images_from_directory, extract_edges, compute_edge_cost_matrix
+
+# Reassembles images cut into a grid of tiles (cut both horizontally and vertically).
+#
+# All four edges of every tile are extracted once. For each tile and direction
+# only the few most compatible neighbours are kept, found with batched block-wise
+# distance computations (or an EdgeIndex for very large sets). Tiles are then
+# placed by greedy growth from a seed: best-buddy pairs (two tiles that are each
+# other's best match) go first, and a placement is scored against every
+# neighbour already on the grid, not just the one that proposed it.
+
+TILE_CANDIDATES = 8  # neighbours kept per tile and direction
+EXACT_TILE_LIMIT = 2000  # above this, candidate neighbours come from an EdgeIndex
+
+# direction -> (row step, column step)
+DIRECTIONS = {"below": (1, 0), "above": (-1, 0), "right": (0, 1), "left": (0, -1)}
+OPPOSITE = {"below": "above", "above": "below", "right": "left", "left": "right"}
+# direction -> (edge of the tile, edge of the neighbour that touches it)
+EDGE_PAIRS = {"below": ("bottom", "top"), "above": ("top", "bottom"),
+              "right": ("right", "left"), "left": ("left", "right")}
+
+
+def extract_tile_edges(tiles):
+    """Extracts all four edges of every tile.
+
+    Args:
+        tiles (list): Image tiles, all the same size.
+
+    Returns:
+        dict: "top", "bottom", "left" and "right" mapped to (N, edge length * 3) int16 arrays.
+    """
+
+    tops, bottoms = extract_edges(tiles)
+    lefts = np.stack([tile.get_column(0).reshape(-1) for tile in tiles]).astype(np.int16)
+    rights = np.stack([tile.get_column(tile.get_width() - 1).reshape(-1) for tile in tiles]).astype(np.int16)
+    return {"top": tops, "bottom": bottoms, "left": lefts, "right": rights}
+
+
+def _nearest_neighbours(sources, targets, k, index_options=None, block_rows=256):
+    """For each source edge, the k target edges closest to it (excluding itself).
+
+    Returns:
+        tuple: (neighbours, costs), two (N, k) arrays sorted best first.
+    """
+
+    n = len(sources)
+    k = min(k, n - 1)
+    neighbours = np.empty((n, k), dtype=np.int64)
+    costs = np.empty((n, k), dtype=np.int64)
+
+    if n > EXACT_TILE_LIMIT:
+        index = EdgeIndex(targets, **dict({"k": k + 1}, **(index_options or {})))
+        for i in range(n):
+            found = index.query(sources[i])
+            found = found[found != i]
+            found_costs = np.abs(targets[found] - sources[i]).sum(axis=1)
+            best = np.argsort(found_costs, kind='stable')[:k]
+            m = len(best)
+            neighbours[i, :m], costs[i, :m] = found[best], found_costs[best]
+            neighbours[i, m:], costs[i, m:] = -1, np.iinfo(np.int64).max
+        return neighbours, costs
+
+    for start in range(0, n, block_rows):
+        block = compute_edge_cost_matrix(sources[start:start + block_rows], targets)
+        rows = np.arange(len(block))
+        block[rows, rows + start] = np.iinfo(np.int64).max  # a tile can't neighbour itself
+        nearest = np.argpartition(block, k - 1, axis=1)[:, :k] if k < n - 1 else np.argsort(block, axis=1)[:, :k]
+        nearest_costs = block[rows[:, None], nearest]
+        order = np.lexsort((nearest, nearest_costs), axis=1)
+        neighbours[start:start + len(block)] = np.take_along_axis(nearest, order, axis=1)
+        costs[start:start + len(block)] = np.take_along_axis(nearest_costs, order, axis=1)
+    return neighbours, costs
+
+
+def compute_tile_candidates(edges, k=TILE_CANDIDATES, index_options=None):
+    """Finds the k most compatible neighbours of every tile in each direction.
+
+    Args:
+        edges (dict): Edges from extract_tile_edges.
+        k (int): Candidates kept per tile and direction.
+        index_options (dict): EdgeIndex options, used when there are more than
+            EXACT_TILE_LIMIT tiles.
+
+    Returns:
+        dict: direction -> (neighbours, costs) arrays of shape (N, k), where
+            neighbours[i] are the tiles that fit best in that direction from tile i.
+    """
+
+    return {direction: _nearest_neighbours(edges[own], edges[other], k, index_options)
+            for direction, (own, other) in EDGE_PAIRS.items()}
+
+
+class TilePlacer:
+    """Greedy-growth placement of tiles on a grid.
+
+    Args:
+        edges (dict): Edges from extract_tile_edges.
+        candidates (dict): Neighbour candidates from compute_tile_candidates.
+        rows (int): Grid height if known, placements never make the layout taller.
+        cols (int): Grid width if known.
+    """
+
+    def __init__(self, edges, candidates, rows=None, cols=None):
+        self.edges = edges
+        self.candidates = candidates
+        self.rows = rows
+        self.cols = cols
+        self.n = len(edges["top"])
+        self.grid = {}  # (row, col) -> tile, the spatial index of placed tiles
+        self.placed = {}  # tile -> (row, col)
+        self.unplaced = np.ones(self.n, dtype=bool)
+        self.frontier = set()  # empty positions next to a placed tile
+        self.heap = []
+        self.counter = 0  # keeps heap entries comparable and the order deterministic
+        self.bounds = None  # (min row, max row, min col, max col)
+
+    def _pair_cost(self, tile, direction, neighbour):
+        """Cost of neighbour sitting in direction from tile."""
+        own, other = EDGE_PAIRS[direction]
+        return int(np.abs(self.edges[own][tile] - self.edges[other][neighbour]).sum())
+
+    def _is_best_buddy(self, tile, direction, neighbour):
+        forward = self.candidates[direction][0][tile]
+        backward = self.candidates[OPPOSITE[direction]][0][neighbour]
+        return len(forward) and forward[0] == neighbour and backward[0] == tile
+
+    def _fits(self, position):
+        if self.bounds is None:
+            return True
+        r, c = position
+        min_r, max_r, min_c, max_c = self.bounds
+        if self.rows is not None and max(max_r, r) - min(min_r, r) + 1 > self.rows:
+            return False
+        if self.cols is not None and max(max_c, c) - min(min_c, c) + 1 > self.cols:
+            return False
+        return True
+
+    def _placed_neighbours(self, position):
+        r, c = position
+        return sum((r + dr, c + dc) in self.grid for dr, dc in DIRECTIONS.values())
+
+    def _score(self, tile, position):
+        """(best-buddy miss count, mean cost) of tile at position against placed neighbours."""
+        total = 0
+        count = 0
+        misses = 0
+        r, c = position
+        for direction, (dr, dc) in DIRECTIONS.items():
+            neighbour = self.grid.get((r + dr, c + dc))
+            if neighbour is None:
+                continue
+            # the neighbour sits in `direction` from the new tile
+            total += self._pair_cost(tile, direction, neighbour)
+            count += 1
+            if not self._is_best_buddy(tile, direction, neighbour):
+                misses += 1
+        return misses, total / max(count, 1)
+
+    def _push(self, key, tile, position, evaluated_with):
+        # evaluated_with is how many placed neighbours the key was scored against (-1 if not yet)
+        heapq.heappush(self.heap, (key, self.counter, tile, position, evaluated_with))
+        self.counter += 1
+
+    def _place(self, tile, position):
+        self.grid[position] = tile
+        self.placed[tile] = position
+        self.unplaced[tile] = False
+        self.frontier.discard(position)
+        r, c = position
+        if self.bounds is None:
+            self.bounds = (r, r, c, c)
+        else:
+            min_r, max_r, min_c, max_c = self.bounds
+            self.bounds = (min(min_r, r), max(max_r, r), min(min_c, c), max(max_c, c))
+
+        # propose this tile's candidate neighbours for its empty sides
+        for direction, (dr, dc) in DIRECTIONS.items():
+            target = (r + dr, c + dc)
+            if target in self.grid:
+                continue
+            self.frontier.add(target)
+            if not self._fits(target):
+                continue
+            neighbours, costs = self.candidates[direction]
+            for neighbour, cost in zip(neighbours[tile], costs[tile]):
+                if neighbour >= 0 and neighbour not in self.placed:
+                    buddy = self._is_best_buddy(tile, direction, neighbour)
+                    self._push((0 if buddy else 1, int(cost)), int(neighbour), target, -1)
+
+    def _fill_best_spot(self):
+        """Fallback once every proposed candidate is used up.
+
+        Takes the most constrained open spot and puts the unplaced tile that fits its
+        placed neighbours best there, comparing against all unplaced tiles at once.
+        Returns False if there is no open spot left.
+        """
+
+        open_spots = [position for position in self.frontier if self._fits(position)]
+        if not open_spots:
+            return False
+        position = max(open_spots, key=lambda p: (self._placed_neighbours(p), -p[0], -p[1]))
+
+        tiles = np.flatnonzero(self.unplaced)
+        costs = np.zeros(len(tiles), dtype=np.int64)
+        r, c = position
+        for direction, (dr, dc) in DIRECTIONS.items():
+            neighbour = self.grid.get((r + dr, c + dc))
+            if neighbour is not None:
+                own, other = EDGE_PAIRS[direction]
+                costs += np.abs(self.edges[own][tiles] - self.edges[other][neighbour]).sum(axis=1)
+        self._place(int(tiles[costs.argmin()]), position)
+        return True
+
+    def _seed(self):
+        """The tile with the most best-buddy relations, lowest index on ties."""
+        buddies = np.zeros(self.n, dtype=np.int64)
+        for direction in DIRECTIONS:
+            best = self.candidates[direction][0][:, 0]
+            back = self.candidates[OPPOSITE[direction]][0][:, 0]
+            valid = best >= 0
+            buddies[valid] += back[best[valid]] == np.flatnonzero(valid)
+        return int(buddies.argmax())
+
+    def place_all(self):
+        """Places every tile and returns the grid as a list of rows (None for holes)."""
+        if self.n == 0:
+            return []
+        self._place(self._seed(), (0, 0))
+
+        while len(self.placed) < self.n:
+            if not self.heap:
+                if not self._fill_best_spot():
+                    break
+                continue
+
+            key, _, tile, position, evaluated_with = heapq.heappop(self.heap)
+            if tile in self.placed or position in self.grid or not self._fits(position):
+                continue
+            neighbour_count = self._placed_neighbours(position)
+            if evaluated_with != neighbour_count:
+                # rescore against all neighbours now on the grid, then let it compete again
+                self._push(self._score(tile, position), tile, position, neighbour_count)
+                continue
+            self._place(tile, position)
+
+        min_r, max_r, min_c, max_c = self.bounds
+        return [[self.grid.get((r, c)) for c in range(min_c, max_c + 1)]
+                for r in range(min_r, max_r + 1)]
+
+
+def reconstruct_tiles(tiles, rows=None, cols=None, k=TILE_CANDIDATES, index_options=None):
+    """Reconstructs an image from shuffled tiles.
+
+    Args:
+        tiles (list): Image tiles, all the same size.
+        rows (int): Number of tile rows in the original image, if known.
+        cols (int): Number of tile columns in the original image, if known.
+        k (int): Neighbour candidates kept per tile and direction.
+        index_options (dict): EdgeIndex options for very large tile sets.
+
+    Returns:
+        list: Rows of tiles from top to bottom (None where no tile was placed).
+    """
+
+    if len(tiles) <= 1:
+        return [tiles] if tiles else []
+    edges = extract_tile_edges(tiles)
+    candidates = compute_tile_candidates(edges, k, index_options)
+    layout = TilePlacer(edges, candidates, rows, cols).place_all()
+    return [[None if t is None else tiles[t] for t in row] for row in layout]
+
+
+def save_tile_grid(grid, output_path="reconstructed.bmp"):
+    """Writes a grid of tiles as one BMP, one row of tiles at a time.
+
+    Args:
+        grid (list): Rows of tiles as returned by reconstruct_tiles.
+        output_path (str): Where to write the .bmp file.
+    """
+
+    sample = next(tile for row in grid for tile in row if tile is not None)
+    tile_width, tile_height = sample.get_width(), sample.get_height()
+    width = tile_width * len(grid[0])
+
+    with BmpStreamWriter(output_path, width, tile_height * len(grid)) as writer:
+        band = np.zeros((tile_height, width, 3), dtype=np.uint8)
+        for row in reversed(grid):  # BMP is bottom-up
+            band[...] = 0
+            for c, tile in enumerate(row):
+                if tile is not None:
+                    band[:, c * tile_width:(c + 1) * tile_width] = tile.get_region(0, 0, tile_height, tile_width)
+            writer.write_rows(band)
+
+
+def reconstruct_tile_directory(directory_path, output_path="reconstructed.bmp", rows=None, cols=None, workers=None):
+    """Loads every tile in a directory, reassembles them and saves the result."""
+    tiles = load_images_from_directory(directory_path, workers=workers)
+    save_tile_grid(reconstruct_tiles(tiles, rows, cols), output_path)
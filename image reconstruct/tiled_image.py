@@ -0,0 +1,175 @@
+import os
+import tempfile
+import weakref
+from collections import OrderedDict
+import numpy as np
+from image import Pixel
+from bmp_codec import BmpStreamWriter, map_bmp
+from png_codec import PngStreamWriter, DEFAULT_LEVEL, DEFAULT_FILTER
+
+# Out-of-core alternative to Image for pictures larger than memory.
+#
+# Pixels live in a raw (height, width, 3) RGB file on disk. The file is accessed
+# in blocks of rows, each block memory-mapped on first use and kept in an LRU
+# cache of at most max_cached_blocks mappings. Evicted blocks are flushed and
+# unmapped, so resident memory stays around max_cached_blocks * block_rows rows
+# however large the image is.
+
+DEFAULT_BLOCK_ROWS = 256
+DEFAULT_CACHED_BLOCKS = 16
+
+
+def _remove_file(filename):
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
+
+
+class TiledImage:
+    """Disk-backed image with the same accessors as Image.
+
+    Args:
+        width (int): Image width in pixels.
+        height (int): Image height in pixels.
+        filename (str): Backing file, created (zero-filled) if it doesn't exist. When
+            omitted a temporary file is used and deleted again by close(), or when
+            the image is garbage collected or the interpreter exits if it never is.
+        block_rows (int): Rows per memory-mapped block.
+        max_cached_blocks (int): Most blocks mapped at the same time.
+    """
+
+    def __init__(self, width, height, filename=None, block_rows=DEFAULT_BLOCK_ROWS,
+                 max_cached_blocks=DEFAULT_CACHED_BLOCKS):
+        self.width = width
+        self.height = height
+        self.block_rows = block_rows
+        self.max_cached_blocks = max(1, max_cached_blocks)
+        self.cache = OrderedDict()  # block index -> memmap, least recently used first
+        self.owns_file = filename is None
+
+        if filename is None:
+            handle, filename = tempfile.mkstemp(suffix='.rgb')
+            os.close(handle)
+        self.filename = filename
+        self._remove_temp_file = weakref.finalize(self, _remove_file, filename) if self.owns_file else None
+        size = width * height * 3
+        if not os.path.exists(filename) or os.path.getsize(filename) < size:
+            with open(filename, 'ab') as f:
+                f.truncate(size)  # sparse on most filesystems, nothing is written yet
+
+    @staticmethod
+    def from_bmp(filename, backing_file=None, block_rows=DEFAULT_BLOCK_ROWS,
+                 max_cached_blocks=DEFAULT_CACHED_BLOCKS):
+        """Copies a BMP file into a new TiledImage one row block at a time.
+
+        Args:
+            filename (str): Path to the .bmp file.
+            backing_file (str): Where to keep the pixels, a temporary file by default.
+
+        Returns:
+            TiledImage: The image, never fully resident in memory.
+        """
+
+        header, pixels = map_bmp(filename)
+        image = TiledImage(header.width, header.height, backing_file, block_rows, max_cached_blocks)
+        for start in range(0, header.height, block_rows):
+            image.set_region(start, 0, pixels[start:start + block_rows])
+        return image
+
+    def _block(self, index):
+        block = self.cache.get(index)
+        if block is not None:
+            self.cache.move_to_end(index)
+            return block
+
+        if len(self.cache) >= self.max_cached_blocks:
+            _, evicted = self.cache.popitem(last=False)
+            evicted.flush()
+        start = index * self.block_rows
+        rows = min(self.block_rows, self.height - start)
+        block = np.memmap(self.filename, dtype=np.uint8, mode='r+',
+                          offset=start * self.width * 3, shape=(rows, self.width, 3))
+        self.cache[index] = block
+        return block
+
+    def _row_blocks(self, r, height):
+        """Yields (block, first row in block, rows, offset into the requested range)."""
+        done = 0
+        while done < height:
+            row = r + done
+            index, inside = divmod(row, self.block_rows)
+            block = self._block(index)
+            rows = min(height - done, len(block) - inside)
+            yield block, inside, rows, done
+            done += rows
+
+    def get_width(self):
+        return self.width
+
+    def get_height(self):
+        return self.height
+
+    def set_pixel(self, r, c, pixel):
+        if 0 <= c < self.width and 0 <= r < self.height:
+            self._block(r // self.block_rows)[r % self.block_rows, c] = (pixel.r, pixel.g, pixel.b)
+
+    def get_pixel(self, r, c):
+        if 0 <= c < self.width and 0 <= r < self.height:
+            red, green, blue = self._block(r // self.block_rows)[r % self.block_rows, c]
+            return Pixel(int(red), int(green), int(blue))
+
+    def get_row(self, r):
+        """Returns row r as a (width, 3) view into its mapped block."""
+        return self._block(r // self.block_rows)[r % self.block_rows]
+
+    def get_column(self, c):
+        """Returns column c as a (height, 3) array, read block by block (a copy)."""
+        return self.get_region(0, c, self.height, 1)[:, 0]
+
+    def get_region(self, r, c, height, width):
+        """Returns a block of pixels: a view if it fits in one row block, a copy otherwise."""
+        height = max(0, min(height, self.height - r))
+        index, inside = divmod(r, self.block_rows)
+        if height and inside + height <= self.block_rows:
+            return self._block(index)[inside:inside + height, c:c + width]
+
+        region = np.empty((height, max(0, min(width, self.width - c)), 3), dtype=np.uint8)
+        for block, first, rows, offset in self._row_blocks(r, height):
+            region[offset:offset + rows] = block[first:first + rows, c:c + width]
+        return region
+
+    def set_region(self, r, c, values):
+        """Copies a (rows, cols, 3) array into the image starting at (r, c)."""
+        height, width = values.shape[:2]
+        for block, first, rows, offset in self._row_blocks(r, min(height, self.height - r)):
+            block[first:first + rows, c:c + width] = values[offset:offset + rows]
+
+    def save_bmp(self, filename):
+        """Writes the image as a 24 bit BMP one row block at a time."""
+        with BmpStreamWriter(filename, self.width, self.height) as writer:
+            for start in reversed(range(0, self.height, self.block_rows)):  # BMP is bottom-up
+                writer.write_rows(self.get_region(start, 0, self.block_rows, self.width))
+
+    def save_png(self, filename, level=DEFAULT_LEVEL, filter_type=DEFAULT_FILTER):
+        """Writes the image as a compressed PNG one row block at a time."""
+        with PngStreamWriter(filename, self.width, self.height, level, filter_type) as writer:
+            for start in range(0, self.height, self.block_rows):
+                writer.write_rows(self.get_region(start, 0, self.block_rows, self.width))
+
+    def flush(self):
+        for block in self.cache.values():
+            block.flush()
+
+    def close(self):
+        """Flushes and unmaps every block, deleting the backing file if it was temporary."""
+        self.flush()
+        self.cache.clear()
+        if self._remove_temp_file is not None:
+            self._remove_temp_file()  # runs once, later calls and garbage collection do nothing
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()